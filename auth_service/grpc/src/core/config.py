@@ -39,6 +39,8 @@ class Settings(BaseSettings):
     postgres_dsn: PostgresDsn
     redis_dsn: RedisDsn
     default_cache_ttl: int = Field(default=10)
+    # services that cache the access decisions subscribe to the channel
+    policies_changed_channel: str | None = "auth:policies"
     secret_key: str
     log_level: str
     log_folder: str
@@ -0,0 +1,16 @@
+from db.cache.redis.redis import RedisAsyncCacheStorage
+
+
+class PolicyCacheStorage(RedisAsyncCacheStorage):
+    POLICIES_CHANGED_MESSAGE: str = "changed"
+
+    async def publish_policies_changed(self, channel: str) -> None:
+        """Оповещение сервисов об изменении политик доступа, чтобы они сбросили закэшированные решения."""
+        await self._storage.publish(channel, self.POLICIES_CHANGED_MESSAGE)
+
+    async def delete_by_prefix(self, prefix: str) -> None:
+        """Удаление закэшированных значений, ключи которых начинаются с префикса."""
+        keys = [key async for key in self._storage.scan_iter(match=f"{prefix}*")]
+
+        if keys:
+            await self._storage.delete(*keys)
@@ -27,6 +27,8 @@ from api.schemas.admin_role import (
     AnyUserOAuthProviderAccountDto,
 )
 from api.schemas.base import BasePaginationResultDto
+from core.config import get_settings
+from db.cache.redis.policy import PolicyCacheStorage
 from db.storage.postgres.abac import ABACCrudStorage
 from db.storage.postgres.user import UserCrudStorage
 from db.storage.postgres.oauth import UserOAuthAccountCrudStorage
@@ -54,6 +56,19 @@ class UserSubject(BaseOrjsonModel):
 
 # noinspection PyAttributeOutsideInit
 class AdminRoleService(BaseService):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policy_cache_manager: PolicyCacheStorage = PolicyCacheStorage(client=self.cache_storage._storage)
+
+    async def _on_policies_changed(self) -> None:
+        # the cached decisions were made by the previous policies
+        await self.policy_cache_manager.delete_by_prefix(
+            f"{self.policy_cache_manager.get_cache_key(AdminRoleService._check_access)}__"
+        )
+
+        if channel := get_settings().policies_changed_channel:
+            await self.policy_cache_manager.publish_policies_changed(channel)
+
     @asynccontextmanager
     async def prepare(self) -> None:
         async with self.session_maker() as session:
@@ -141,6 +156,8 @@ class AdminRoleService(BaseService):
             except IntegrityError:
                 raise PolicyAlreadyExistsError()
 
+        await self._on_policies_changed()
+
         return CreatePolicyResultDto(id=policy_model.id)
 
     async def update_policy(self, entry_dto: UpdatePolicyEntryDto) -> UpdatePolicyResultDto:
@@ -166,6 +183,8 @@ class AdminRoleService(BaseService):
                 logger.exception(e)
                 raise PolicyAlreadyExistsError()
 
+        await self._on_policies_changed()
+
         return UpdatePolicyResultDto()
 
     async def delete_policy(self, entry_dto: DeletePolicyEntryDto) -> DeletePolicyResultDto:
@@ -181,6 +200,8 @@ class AdminRoleService(BaseService):
 
             await self.abac_pip_manager.delete(db_obj=policy_model)
 
+        await self._on_policies_changed()
+
         return DeletePolicyResultDto()
 
     async def get_policy(self, entry_dto: GetPolicyEntryDto) -> GetPolicyResultDto:
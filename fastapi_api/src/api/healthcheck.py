@@ -1,6 +1,16 @@
+from elasticsearch import AsyncElasticsearch
 from fastapi import APIRouter, Depends
 
-from api.schemas.healthcheck import Healthcheck
+from api.schemas.healthcheck import (
+    CacheTierStatistics,
+    ElasticBatchingStatistics,
+    ElasticNodePoolStatistics,
+    Healthcheck,
+)
+from db.storage.cache import get_cache_storage, AbstractAsyncCacheStorage
+from db.storage.elasticsearch import get_elastic, get_elastic_batcher
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
+from db.storage.elasticsearch.pool import get_elastic_pool_stats
 from services.healthcheck import get_healthcheck_service, HealthcheckService
 
 router = APIRouter()
@@ -20,3 +30,60 @@ async def healthcheck(service: HealthcheckService = Depends(get_healthcheck_serv
         db_alive=health.base_storage_alive,
         cache_alive=health.cache_alive,
     )
+
+
+@router.get(
+    "/cache",
+    response_model=list[CacheTierStatistics],
+    summary="Статистика кеша",
+    description="Статистика попаданий в кеш текущего воркера",
+    response_description="Количество попаданий и промахов по уровням кеша",
+    tags=["Internal"],
+)
+async def cache_statistics(
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> list[CacheTierStatistics]:
+    return [
+        CacheTierStatistics(tier=tier, hits=stats.hits, misses=stats.misses, hit_ratio=stats.hit_ratio)
+        for tier, stats in cache.get_stats().items()
+    ]
+
+
+@router.get(
+    "/elastic",
+    response_model=ElasticBatchingStatistics,
+    summary="Статистика пакетных запросов к Elasticsearch",
+    description="Статистика объединения одновременных поисковых запросов текущего воркера в `_msearch`",
+    response_description="Количество пакетов, запросов и средняя заполненность пакета",
+    tags=["Internal"],
+)
+async def elastic_batching_statistics(
+    batcher: ElasticMultiSearchBatcher | None = Depends(get_elastic_batcher),
+) -> ElasticBatchingStatistics:
+    if batcher is None:
+        return ElasticBatchingStatistics(enabled=False, batches=0, searches=0, average_batch_size=0, fill_rate=0)
+
+    return ElasticBatchingStatistics(
+        enabled=True,
+        batches=batcher.stats.batches,
+        searches=batcher.stats.searches,
+        average_batch_size=batcher.stats.average_batch_size,
+        fill_rate=batcher.stats.fill_rate,
+    )
+
+
+@router.get(
+    "/elastic/pool",
+    response_model=list[ElasticNodePoolStatistics],
+    summary="Состояние пулов соединений с Elasticsearch",
+    description="Занятые, свободные и ожидаемые соединения с узлами Elasticsearch текущего воркера",
+    response_description="Состояние пула соединений по узлам",
+    tags=["Internal"],
+)
+async def elastic_pool_statistics(
+    client: AsyncElasticsearch = Depends(get_elastic),
+) -> list[ElasticNodePoolStatistics]:
+    return [
+        ElasticNodePoolStatistics(**stats.dict(), saturation=stats.saturation)
+        for stats in get_elastic_pool_stats(client)
+    ]
@@ -12,3 +12,60 @@ class Healthcheck(BaseModel):
                 "db_alive": True,
             }
         }
+
+
+class CacheTierStatistics(BaseModel):
+    tier: str
+    hits: int
+    misses: int
+    hit_ratio: float
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "tier": "memory",
+                "hits": 900,
+                "misses": 100,
+                "hit_ratio": 0.9,
+            }
+        }
+
+
+class ElasticBatchingStatistics(BaseModel):
+    enabled: bool
+    batches: int
+    searches: int
+    average_batch_size: float
+    fill_rate: float
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "enabled": True,
+                "batches": 100,
+                "searches": 500,
+                "average_batch_size": 5.0,
+                "fill_rate": 0.25,
+            }
+        }
+
+
+class ElasticNodePoolStatistics(BaseModel):
+    node: str
+    connections_limit: int
+    in_use: int
+    idle: int
+    waiting: int
+    saturation: float
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "node": "http://elasticsearch:9200",
+                "connections_limit": 10,
+                "in_use": 4,
+                "idle": 6,
+                "waiting": 0,
+                "saturation": 0.4,
+            }
+        }
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, status
 
 from . import film as film_route, genre as genre_route, person as person_route
+from .dependencies import check_access, record_popular_request
 
-router = APIRouter(responses={status.HTTP_404_NOT_FOUND: {"description": "Page not found"}})
+router = APIRouter(
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Page not found"}},
+    dependencies=[Depends(check_access), Depends(record_popular_request)],
+)
 
 router.include_router(film_route.router, prefix="/films", tags=["Films"])
 router.include_router(genre_route.router, prefix="/genres", tags=["Genres"])
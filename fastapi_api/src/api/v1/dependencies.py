@@ -1,34 +1,181 @@
+from typing import Callable
 from uuid import UUID
 
-from fastapi import Query
+from fastapi import Depends, Query, Request
 from pydantic import BaseModel
 
+from core.auth import AccessChecker, get_access_checker
+from db.storage.base import CountModes, Cursor
+from db.storage.cache import get_popular_requests
+from db.storage.cache.warmup import PopularRequests
+from .exceptions import raise_bad_request, raise_forbidden, Exceptions
+
+# endpoints of the routes that are not counted in the top of the requests replayed by the cache warmup
+NOT_RECORDED_ENDPOINTS: set[Callable] = set()
+
+
+# the deeper offset pages are slow in ElasticSearch, they are read with the cursors
+MAX_PAGE_NUMBER = 50
+
 
 class Paginator(BaseModel):
     page: int
     size: int
 
 
+class PageCursor(BaseModel):
+    enabled: bool
+    cursor: Cursor | None
+
+
 class Searcher(BaseModel):
     query: str
 
 
+class Suggester(BaseModel):
+    prefix: str
+    size: int
+
+
 class FilmListFilter(BaseModel):
     genre: UUID | None
 
 
+class IdsBatch(BaseModel):
+    ids: list[UUID]
+
+
 async def get_paginator(
-    page: int = Query(default=1, alias="page[number]", description="Номер страницы", ge=1, le=50),
+    page: int = Query(default=1, alias="page[number]", description="Номер страницы", ge=1, le=MAX_PAGE_NUMBER),
     size: int = Query(default=10, alias="page[size]", description="Размер страницы", ge=1, le=100),
 ) -> Paginator:
     return Paginator(page=page, size=size)
 
 
+async def get_count_mode(
+    count_mode: CountModes = Query(
+        default=CountModes.CAPPED,
+        alias="page[count]",
+        description="Подсчет записей: точный (`exact`), ограниченный (`capped`, записей может быть больше `count`) "
+        "или без подсчета (`none`), что быстрее всего для широких поисков",
+    ),
+) -> CountModes:
+    return count_mode
+
+
+async def get_page_cursor(
+    cursor: str | None = Query(
+        default=None,
+        alias="page[cursor]",
+        description="Курсор из поля `cursor` предыдущего ответа, пустое значение - первая страница",
+    ),
+) -> PageCursor:
+    if cursor is None:
+        return PageCursor(enabled=False, cursor=None)
+
+    if not cursor:
+        return PageCursor(enabled=True, cursor=None)
+
+    try:
+        return PageCursor(enabled=True, cursor=Cursor.decode(cursor))
+    except ValueError:
+        raise_bad_request(Exceptions.INVALID_CURSOR)
+
+
+async def get_export_cursor(
+    cursor: str | None = Query(
+        default=None,
+        description="Курсор из последней полученной строки выгрузки, без него выгрузка начинается сначала",
+    ),
+) -> Cursor | None:
+    if not cursor:
+        return None
+
+    try:
+        export_cursor = Cursor.decode(cursor)
+    except ValueError:
+        raise_bad_request(Exceptions.INVALID_CURSOR)
+
+    # the export is sorted by the tiebreaker only and its cursors have no point in time, any other cursor
+    # would fail in ElasticSearch after the response has started
+    search_after = export_cursor.search_after
+    if export_cursor.point_in_time is not None or len(search_after) != 1 or not isinstance(search_after[0], str):
+        raise_bad_request(Exceptions.INVALID_CURSOR)
+
+    return export_cursor
+
+
 async def get_searcher(query: str = Query(description="Строка поиска", min_length=1)) -> Searcher:
     return Searcher(query=query)
 
 
+async def get_suggester(
+    # the prefix is stripped before the search, so it must have at least one non-whitespace character
+    prefix: str = Query(description="Начало строки поиска", min_length=1, max_length=100, regex=r"\s*\S"),
+    size: int = Query(default=5, description="Количество подсказок", ge=1, le=10),
+) -> Suggester:
+    return Suggester(prefix=prefix.strip().lower(), size=size)
+
+
 async def get_film_filters(
     genre: UUID | None = Query(default=None, alias="filter[genre]", description="UUID жанра"),
 ) -> FilmListFilter:
     return FilmListFilter(genre=genre)
+
+
+async def get_ids_batch(
+    ids: list[UUID] = Query(description="Список UUID", min_items=1, max_items=50),
+) -> IdsBatch:
+    return IdsBatch(ids=ids)
+
+
+def not_recorded(endpoint: Callable) -> Callable:
+    """Excludes the route from the top of the requests replayed by the cache warmup, e.g. a route without caching."""
+    NOT_RECORDED_ENDPOINTS.add(endpoint)
+    return endpoint
+
+
+async def record_popular_request(
+    request: Request,
+    popular_requests: PopularRequests | None = Depends(get_popular_requests),
+):
+    """
+    Counts the request in the top of the requests replayed by the cache warmup. The request is counted after
+    the response, only if the route has not raised an error, e.g. "not found" or "access denied".
+    """
+    yield
+
+    if popular_requests is not None and request.scope.get("endpoint") not in NOT_RECORDED_ENDPOINTS:
+        await popular_requests.record(request)
+
+
+def get_path_template(request: Request) -> str:
+    """Returns the path of the matched route with the placeholders of the path parameters."""
+    endpoint = request.scope.get("endpoint")
+
+    for route in request.app.routes:
+        if getattr(route, "endpoint", None) is endpoint and request.method in getattr(route, "methods", ()):
+            return route.path
+
+    return request.url.path
+
+
+async def check_access(
+    request: Request,
+    access_checker: AccessChecker | None = Depends(get_access_checker),
+):
+    """Asks the auth service whether the client has access to the route."""
+    if access_checker is None:
+        return
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    has_access = await access_checker.has_access(
+        token=token if scheme.lower() == "bearer" else "",
+        path_template=get_path_template(request),
+        action=request.method,
+        ip=request.headers.get("x-forwarded-for") or (request.client.host if request.client else ""),
+        user_agent=request.headers.get("user-agent", ""),
+    )
+
+    if not has_access:
+        raise_forbidden(Exceptions.ACCESS_DENIED)
@@ -11,7 +11,17 @@ class Exceptions(str, Enum):
     PERSONS_NOT_FOUND = "Persons not found"
     PERSON_NOT_FOUND = "Person not found"
     PERSON_FILMS_NOT_FOUND = "Films for person not found."
+    INVALID_CURSOR = "Invalid page cursor."
+    ACCESS_DENIED = "Access denied."
 
 
 def raise_not_found(message: Exceptions):
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message)
+
+
+def raise_bad_request(message: Exceptions):
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
+
+
+def raise_forbidden(message: Exceptions):
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message)
@@ -1,34 +1,170 @@
+from typing import AsyncIterator
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
 
+from core.config import get_settings
+from db.storage.base import (
+    AggregationBucket,
+    AggregationEntity,
+    AggregationTypes,
+    CountModes,
+    CountRelations,
+    Cursor,
+    FilterEntity,
+    InvalidCursorError,
+    QueryBuilder,
+    SearchString,
+    SearchTypes,
+    SortEntity,
+    SortingOrders,
+)
+from db.storage.cache import get_cache_storage, get_suggest_cache_storage, AbstractAsyncCacheStorage
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+from db.storage.elasticsearch.film import FilmElasticStorage, get_film_elastic_storage
 from services.film import FilmService, get_film_service
-from .dependencies import get_paginator, Paginator, Searcher, get_film_filters, get_searcher, FilmListFilter
-from .exceptions import raise_not_found, Exceptions
-from .schemas.film import BaseFilm, Film, FilmListSorting, FilmListWithPagination
+from .dependencies import (
+    get_paginator,
+    Paginator,
+    Searcher,
+    get_film_filters,
+    get_searcher,
+    FilmListFilter,
+    IdsBatch,
+    get_ids_batch,
+    get_export_cursor,
+    not_recorded,
+    PageCursor,
+    get_page_cursor,
+    get_count_mode,
+    MAX_PAGE_NUMBER,
+    Suggester,
+    get_suggester,
+)
+from .exceptions import raise_bad_request, raise_not_found, Exceptions
+from .responses import cached_response, get_response_fields, model_response
+from .schemas.facets import FacetBucket
+from .schemas.film import BaseFilm, Film, FilmFacets, FilmListSorting, FilmListWithPagination, FilmSuggestion
+from .schemas.results import get_total_pages
 
 router = APIRouter()
 
+# counted by the same search as the films, so the filters can show the number of films without other requests
+FILM_FACETS = (
+    AggregationEntity(name="genres", field_name="genres.id", label_field="genres.name", size=100),
+    AggregationEntity(
+        name="release_years", field_name="release_date", aggregation_type=AggregationTypes.YEAR_HISTOGRAM
+    ),
+    AggregationEntity(name="age_limits", field_name="age_limit"),
+)
+FILM_SEARCH_FIELDS = ("title", "description")
+
+
+def make_film_facets(aggregations: dict[str, list[AggregationBucket]]) -> FilmFacets:
+    return FilmFacets(
+        **{
+            name: [FacetBucket(value=str(bucket.key), name=bucket.label, count=bucket.count) for bucket in buckets]
+            for name, buckets in aggregations.items()
+        }
+    )
+
+
+async def films_page(
+    query: QueryBuilder, paginator: Paginator, count_mode: CountModes, with_facets: bool = False
+) -> FilmListWithPagination:
+    """
+    Returns the page of the films and, if requested, the facets of all the films matching the query with a single
+    search. The films are counted at most up to the last page the paginator can reach, unless counted exactly.
+    """
+    query = query.offset((paginator.page - 1) * paginator.size).count(count_mode, MAX_PAGE_NUMBER * paginator.size)
+
+    if with_facets:
+        query = query.aggregate(*FILM_FACETS)
+
+    films_response = await query.fetch_count(paginator.size)
 
-def process_films_with_pagination(films_response) -> FilmListWithPagination:
     if not films_response:
         raise_not_found(Exceptions.FILMS_NOT_FOUND)
 
-    return FilmListWithPagination(
+    total_pages = get_total_pages(films_response.count, paginator.size)
+    if total_pages is None:
+        # without the count a full page may be followed by another one
+        has_next = len(films_response.entities) == paginator.size
+    else:
+        has_next = paginator.page < total_pages
+
+    return FilmListWithPagination.construct(
         count=films_response.count,
-        total_pages=films_response.total_pages,
-        prev=films_response.prev,
-        next=films_response.next,
-        results=[
-            BaseFilm(
-                uuid=film.uuid,
-                title=film.title,
-                imdb_rating=film.imdb_rating,
-                release_date=film.release_date,
-                age_limit=film.age_limit,
-            )
-            for film in films_response.results
-        ],
+        count_is_exact=films_response.count_relation == CountRelations.EQ,
+        total_pages=total_pages,
+        prev=paginator.page - 1 if paginator.page > 1 else None,
+        next=paginator.page + 1 if has_next else None,
+        results=films_response.entities,
+        facets=make_film_facets(films_response.aggregations) if with_facets else None,
+    )
+
+
+def get_film_tags(film: BaseFilm) -> list[str]:
+    return [AbstractAsyncCacheStorage.get_entity_tag(FilmElasticStorage.index_name, film.uuid)]
+
+
+def get_films_page_tags(films_page: FilmListWithPagination) -> list[str]:
+    """A page is evicted on any change of the films, since changed or new films may move into or out of it."""
+    return [AbstractAsyncCacheStorage.get_index_tag(FilmElasticStorage.index_name)]
+
+
+def make_films_query(
+    film_storage: FilmElasticStorage, filters: FilmListFilter, sort: FilmListSorting | None
+) -> QueryBuilder:
+    query = film_storage.query().project(BaseFilm)
+
+    if filters.genre:
+        query = query.filter(FilterEntity(field_name="genres.id", value=str(filters.genre)))
+
+    if sort:
+        order = SortingOrders.DESC if sort == FilmListSorting.RATING_DESC else SortingOrders.ASC
+        query = query.sort(SortEntity(field_name=sort.value.lstrip("-"), order=order))
+
+    return query
+
+
+async def films_list_by_cursor(
+    film_storage: FilmElasticStorage,
+    filters: FilmListFilter,
+    sort: FilmListSorting | None,
+    page_cursor: PageCursor,
+    page_size: int,
+    count_mode: CountModes = CountModes.CAPPED,
+    with_facets: bool = False,
+) -> FilmListWithPagination:
+    query = make_films_query(film_storage, filters, sort).after(page_cursor.cursor).count(count_mode)
+
+    # the facets don't change from page to page, they are counted for the first one only
+    if with_facets and page_cursor.cursor is None:
+        query = query.aggregate(*FILM_FACETS)
+
+    try:
+        films_response = await query.fetch_next(page_size)
+    except InvalidCursorError:
+        raise_bad_request(Exceptions.INVALID_CURSOR)
+
+    # a page after the cursor may be empty if the films were deleted since the previous page
+    if not films_response.entities and page_cursor.cursor is None:
+        raise_not_found(Exceptions.FILMS_NOT_FOUND)
+
+    return FilmListWithPagination.construct(
+        count=films_response.count,
+        count_is_exact=films_response.count_relation == CountRelations.EQ,
+        total_pages=get_total_pages(films_response.count, page_size),
+        prev=None,
+        next=None,
+        cursor=films_response.next_cursor and films_response.next_cursor.encode(),
+        results=films_response.entities,
+        facets=make_film_facets(films_response.aggregations) if query.aggregations_ else None,
     )
 
 
@@ -41,17 +177,144 @@ def process_films_with_pagination(films_response) -> FilmListWithPagination:
     tags=["Films"],
 )
 async def films_search(
+    request: Request,
     paginator: Paginator = Depends(get_paginator),
     search: Searcher = Depends(get_searcher),
-    film_service: FilmService = Depends(get_film_service),
-) -> FilmListWithPagination:
-    films_response = await film_service.search_films(
-        search_query=search.query,
-        page_size=paginator.size,
-        page_num=paginator.page,
+    count_mode: CountModes = Depends(get_count_mode),
+    with_facets: bool = Query(
+        default=False, alias="facets", description="Добавить в ответ количество фильмов по значениям фильтров"
+    ),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    async def build_response() -> FilmListWithPagination:
+        query = (
+            film_storage.query()
+            .project(BaseFilm)
+            .search(
+                SearchString(
+                    search_string=search.query, search_fields=FILM_SEARCH_FIELDS, type_search=SearchTypes.FUZZY
+                )
+            )
+        )
+        return await films_page(query, paginator, count_mode, with_facets)
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        tags=get_films_page_tags,
+        not_found_tags=[cache.get_not_found_tag(FilmElasticStorage.index_name)],
+    )
+
+
+@router.get(
+    "/suggest",
+    response_model=list[FilmSuggestion],
+    summary="Подсказки по названиям фильмов",
+    description="Поиск фильмов по началу названия для автодополнения при вводе",
+    response_description="Список фильмов, название которых начинается с введенной строки",
+    tags=["Films"],
+)
+async def films_suggest(
+    request: Request,
+    suggester: Suggester = Depends(get_suggester),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+    cache: MemoryAsyncCacheStorage = Depends(get_suggest_cache_storage),
+) -> Response:
+    async def build_response() -> list[FilmSuggestion]:
+        films = await (
+            film_storage.query()
+            .search(
+                SearchString(
+                    search_string=suggester.prefix,
+                    search_fields=["title.suggest"],
+                    type_search=SearchTypes.PREFIX,
+                )
+            )
+            .project(FilmSuggestion)
+            .fetch(suggester.size)
+        )
+
+        return films or []
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        schema=FilmSuggestion,
+        ttl=get_settings().suggest.cache_ttl,
+        cache_key=cache.make_key("suggest", film_storage.index_name, suggester.prefix, str(suggester.size)),
     )
 
-    return process_films_with_pagination(films_response)
+
+async def make_export_lines(films: AsyncIterator[tuple[BaseModel, Cursor]], chunk_size: int) -> AsyncIterator[bytes]:
+    """Returns the NDJSON lines of the films with the cursors, `chunk_size` lines at a time."""
+    film_fields = get_response_fields(Film)
+    lines = []
+
+    async for film, cursor in films:
+        lines.append(
+            orjson.dumps({"cursor": cursor.encode(), "film": film.dict(include=film_fields)}, default=pydantic_encoder)
+        )
+
+        if len(lines) == chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Выгрузка каталога кинопроизведений",
+    description="Все кинопроизведения в формате NDJSON, по строке на фильм. Прерванную выгрузку можно продолжить "
+    "с курсора последней полученной строки",
+    response_description='Строки вида `{"cursor": "...", "film": {...}}`',
+    tags=["Films"],
+)
+# the export is not cached and replaying it would read the whole index
+@not_recorded
+async def films_export(
+    cursor: Cursor | None = Depends(get_export_cursor),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+) -> StreamingResponse:
+    export_settings = get_settings().export
+    # the films are read from ElasticSearch as the client reads the response, so a slow client slows the reading
+    films = film_storage.query().project(Film).after(cursor).scan(export_settings.batch_size)
+
+    return StreamingResponse(make_export_lines(films, export_settings.chunk_size), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/batch",
+    response_model=list[Film],
+    response_model_by_alias=False,
+    summary="Кинопроизведения по списку uuid",
+    description="Детальная информация по нескольким кинопроизведениям за один запрос",
+    response_description="Список найденных кинопроизведений в порядке запрошенных uuid",
+    tags=["Films"],
+)
+async def films_batch(
+    batch: IdsBatch = Depends(get_ids_batch),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    films = await cache.get_many_or_load(
+        index_name=film_storage.index_name,
+        ids=[str(film_id) for film_id in batch.ids],
+        model_type=film_storage.model_type,
+        loader=film_storage.get_entities,
+        ttl=get_settings().default_cache_ttl,
+        negative_ttl=get_settings().negative_cache_ttl,
+    )
+
+    if not any(films):
+        raise_not_found(Exceptions.FILMS_NOT_FOUND)
+
+    return model_response([film for film in films if film is not None], Film)
 
 
 @router.get(
@@ -64,25 +327,26 @@ async def films_search(
     tags=["Films"],
 )
 async def film_details(
+    request: Request,
     film_id: UUID,
     film_service: FilmService = Depends(get_film_service),
-) -> Film:
-    film = await film_service.get_film(film_id=film_id)
-
-    if not film:
-        raise_not_found(Exceptions.FILM_NOT_FOUND)
-
-    return Film(
-        uuid=film.uuid,
-        title=film.title,
-        imdb_rating=film.imdb_rating,
-        release_date=film.release_date,
-        age_limit=film.age_limit,
-        description=film.description,
-        genres=film.genres,
-        actors=film.actors,
-        writers=film.writers,
-        directors=film.directors,
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    async def build_response() -> BaseModel:
+        film = await film_service.get_film(film_id=film_id)
+
+        if not film:
+            raise_not_found(Exceptions.FILM_NOT_FOUND)
+
+        return film
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        schema=Film,
+        tags=get_film_tags,
+        not_found_tags=[cache.get_entity_tag(FilmElasticStorage.index_name, film_id)],
     )
 
 
@@ -90,21 +354,38 @@ async def film_details(
     "/",
     response_model=FilmListWithPagination,
     summary="Перечень кинопроизведений",
-    description="Перечень кинопроизведений с сортировкой и фильтрацией",
+    description="Перечень кинопроизведений с сортировкой и фильтрацией. "
+    "С параметром `page[cursor]` страницы обходятся курсором, что не замедляется с глубиной",
     response_description="Список кинопроизведений и их рейтинг",
     tags=["Films"],
 )
 async def films_list(
+    request: Request,
     paginator: Paginator = Depends(get_paginator),
     filters: FilmListFilter = Depends(get_film_filters),
     sort: FilmListSorting | None = Query(default=None),
-    film_service: FilmService = Depends(get_film_service),
-) -> FilmListWithPagination:
-    films_response = await film_service.get_films(
-        filters=filters,
-        sort=sort,
-        page_size=paginator.size,
-        page_num=paginator.page,
-    )
+    page_cursor: PageCursor = Depends(get_page_cursor),
+    count_mode: CountModes = Depends(get_count_mode),
+    with_facets: bool = Query(
+        default=False, alias="facets", description="Добавить в ответ количество фильмов по значениям фильтров"
+    ),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    if page_cursor.enabled:
+        return model_response(
+            await films_list_by_cursor(
+                film_storage, filters, sort, page_cursor, paginator.size, count_mode, with_facets
+            )
+        )
 
-    return process_films_with_pagination(films_response)
+    async def build_response() -> FilmListWithPagination:
+        return await films_page(make_films_query(film_storage, filters, sort), paginator, count_mode, with_facets)
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        tags=get_films_page_tags,
+        not_found_tags=[cache.get_not_found_tag(FilmElasticStorage.index_name)],
+    )
@@ -1,10 +1,11 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 
 from services.genre import GenreService, get_genre_service
 from .dependencies import Paginator, get_paginator
 from .exceptions import raise_not_found, Exceptions
+from .responses import model_response
 from .schemas.genre import Genre, GenreListWithPagination
 
 router = APIRouter()
@@ -21,16 +22,13 @@ router = APIRouter()
 async def genre_details(
     genre_id: UUID,
     service: GenreService = Depends(get_genre_service),
-) -> Genre:
+) -> Response:
     genre = await service.get_genre(genre_id=genre_id)
 
     if not genre:
         raise raise_not_found(Exceptions.GENRE_NOT_FOUND)
 
-    return Genre(
-        uuid=genre.uuid,
-        name=genre.name,
-    )
+    return model_response(genre, Genre)
 
 
 @router.get(
@@ -44,7 +42,7 @@ async def genre_details(
 async def genres_list(
     service: GenreService = Depends(get_genre_service),
     paginator: Paginator = Depends(get_paginator),
-) -> GenreListWithPagination:
+) -> Response:
     genres_response = await service.get_genres(
         page_size=paginator.size,
         page_num=paginator.page,
@@ -53,16 +51,12 @@ async def genres_list(
     if not genres_response:
         raise_not_found(Exceptions.GENRES_NOT_FOUND)
 
-    return GenreListWithPagination(
-        count=genres_response.count,
-        total_pages=genres_response.total_pages,
-        prev=genres_response.prev,
-        next=genres_response.next,
-        results=[
-            Genre(
-                uuid=genre.uuid,
-                name=genre.name,
-            )
-            for genre in genres_response.results
-        ],
+    return model_response(
+        GenreListWithPagination.construct(
+            count=genres_response.count,
+            total_pages=genres_response.total_pages,
+            prev=genres_response.prev,
+            next=genres_response.next,
+            results=genres_response.results,
+        )
     )
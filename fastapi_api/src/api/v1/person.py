@@ -1,30 +1,88 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from core.config import get_settings
+from db.storage.base import CountRelations, InvalidCursorError, SearchString, SearchTypes, SortEntity, SortingOrders
+from db.storage.cache import get_cache_storage, get_suggest_cache_storage, AbstractAsyncCacheStorage
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+from db.storage.elasticsearch.film import FilmElasticStorage, get_film_elastic_storage
+from db.storage.elasticsearch.person import PersonElasticStorage, get_person_elastic_storage
 from services.film import FilmService, get_film_service
 from services.person import get_person_service, PersonService
-from .dependencies import get_searcher, Searcher, Paginator, get_paginator
-from .exceptions import raise_not_found, Exceptions
-from .schemas.film import BaseFilm
-from .schemas.person import Person, PersonListWithPagination
+from .dependencies import (
+    get_searcher,
+    Searcher,
+    Paginator,
+    get_paginator,
+    IdsBatch,
+    get_ids_batch,
+    Suggester,
+    get_suggester,
+    PageCursor,
+    get_page_cursor,
+)
+from .responses import cached_response, model_response
+from .exceptions import raise_bad_request, raise_not_found, Exceptions
+from .schemas.film import BaseFilm, FilmListSorting
+from .schemas.person import BasePerson, Person, PersonFilm, PersonFilmographyWithPagination, PersonListWithPagination
+from .schemas.results import get_total_pages
 
 router = APIRouter()
 
 
+async def persons_search_by_cursor(
+    person_storage: PersonElasticStorage, searcher: Searcher, page_cursor: PageCursor, page_size: int
+) -> PersonListWithPagination:
+    query = (
+        person_storage.query()
+        .search(SearchString(search_string=searcher.query, search_fields=["name"], type_search=SearchTypes.FUZZY))
+        # the most relevant persons first, the tiebreaker makes the order total
+        .sort(SortEntity(field_name="_score", order=SortingOrders.DESC))
+        .after(page_cursor.cursor)
+    )
+
+    try:
+        persons_response = await query.fetch_next(page_size)
+    except InvalidCursorError:
+        raise_bad_request(Exceptions.INVALID_CURSOR)
+
+    # a page after the cursor may be empty if the persons were deleted since the previous page
+    if not persons_response.entities and page_cursor.cursor is None:
+        raise_not_found(Exceptions.PERSONS_NOT_FOUND)
+
+    return PersonListWithPagination.construct(
+        count=persons_response.count,
+        count_is_exact=persons_response.count_relation == CountRelations.EQ,
+        total_pages=get_total_pages(persons_response.count, page_size),
+        prev=None,
+        next=None,
+        cursor=persons_response.next_cursor and persons_response.next_cursor.encode(),
+        # the index of the persons has no roles and films, they are returned empty
+        results=[Person.construct(**dict(person)) for person in persons_response.entities],
+    )
+
+
 @router.get(
     "/search",
     response_model=PersonListWithPagination,
     summary="Поиск по персонам",
-    description="Поиск информации по персонам",
+    description="Поиск информации по персонам. "
+    "С параметром `page[cursor]` страницы обходятся курсором, что не замедляется с глубиной, "
+    "но роли и фильмы персон не возвращаются",
     response_description="Список персон, сотответствующий параметрам поиска",
     tags=["Persons"],
 )
 async def persons_search(
     searcher: Searcher = Depends(get_searcher),
     paginator: Paginator = Depends(get_paginator),
+    page_cursor: PageCursor = Depends(get_page_cursor),
     service: PersonService = Depends(get_person_service),
-) -> PersonListWithPagination:
+    person_storage: PersonElasticStorage = Depends(get_person_elastic_storage),
+) -> Response:
+    if page_cursor.enabled:
+        return model_response(await persons_search_by_cursor(person_storage, searcher, page_cursor, paginator.size))
+
     persons_response = await service.search_persons(
         search_query=searcher.query,
         page_size=paginator.size,
@@ -34,22 +92,84 @@ async def persons_search(
     if not persons_response:
         raise_not_found(Exceptions.PERSONS_NOT_FOUND)
 
-    return PersonListWithPagination(
-        count=persons_response.count,
-        total_pages=persons_response.total_pages,
-        prev=persons_response.prev,
-        next=persons_response.next,
-        results=[
-            Person(
-                uuid=person.uuid,
-                full_name=person.full_name,
-                role=person.role,
-                films=person.films,
+    return model_response(
+        PersonListWithPagination.construct(
+            count=persons_response.count,
+            total_pages=persons_response.total_pages,
+            prev=persons_response.prev,
+            next=persons_response.next,
+            results=persons_response.results,
+        )
+    )
+
+
+@router.get(
+    "/suggest",
+    response_model=list[BasePerson],
+    summary="Подсказки по именам персон",
+    description="Поиск персон по началу имени для автодополнения при вводе",
+    response_description="Список персон, имя которых начинается с введенной строки",
+    tags=["Persons"],
+)
+async def persons_suggest(
+    request: Request,
+    suggester: Suggester = Depends(get_suggester),
+    person_storage: PersonElasticStorage = Depends(get_person_elastic_storage),
+    cache: MemoryAsyncCacheStorage = Depends(get_suggest_cache_storage),
+) -> Response:
+    async def build_response() -> list[BasePerson]:
+        persons = await (
+            person_storage.query()
+            .search(
+                SearchString(
+                    search_string=suggester.prefix,
+                    search_fields=["name.suggest"],
+                    type_search=SearchTypes.PREFIX,
+                )
             )
-            for person in persons_response.results
-        ],
+            .project(BasePerson)
+            .fetch(suggester.size)
+        )
+
+        return persons or []
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        schema=BasePerson,
+        ttl=get_settings().suggest.cache_ttl,
+        cache_key=cache.make_key("suggest", person_storage.index_name, suggester.prefix, str(suggester.size)),
+    )
+
+
+@router.get(
+    "/batch",
+    response_model=list[BasePerson],
+    summary="Персоны по списку uuid",
+    description="Данные нескольких персон за один запрос",
+    response_description="Список найденных персон в порядке запрошенных uuid",
+    tags=["Persons"],
+)
+async def persons_batch(
+    batch: IdsBatch = Depends(get_ids_batch),
+    person_storage: PersonElasticStorage = Depends(get_person_elastic_storage),
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    persons = await cache.get_many_or_load(
+        index_name=person_storage.index_name,
+        ids=[str(person_id) for person_id in batch.ids],
+        model_type=person_storage.model_type,
+        loader=person_storage.get_entities,
+        ttl=get_settings().default_cache_ttl,
+        negative_ttl=get_settings().negative_cache_ttl,
     )
 
+    if not any(persons):
+        raise_not_found(Exceptions.PERSONS_NOT_FOUND)
+
+    return model_response([person for person in persons if person is not None], BasePerson)
+
 
 @router.get(
     "/{person_id}/film",
@@ -62,22 +182,74 @@ async def persons_search(
 async def person_films(
     person_id: UUID,
     service: FilmService = Depends(get_film_service),
-) -> list[BaseFilm]:
+) -> Response:
     films = await service.get_person_films(person_id=person_id)
 
     if not films:
         raise_not_found(Exceptions.PERSON_FILMS_NOT_FOUND)
 
-    return [
-        BaseFilm(
-            uuid=film.uuid,
-            title=film.title,
-            imdb_rating=film.imdb_rating,
-            release_date=film.release_date,
-            age_limit=film.age_limit,
+    return model_response(films, BaseFilm)
+
+
+@router.get(
+    "/{person_id}/filmography",
+    response_model=PersonFilmographyWithPagination,
+    summary="Фильмография персоны",
+    description="Фильмы с участием персоны и ее роли в них, с сортировкой и постраничным выводом",
+    response_description="Список фильмов персоны",
+    tags=["Persons"],
+)
+async def person_filmography(
+    request: Request,
+    person_id: UUID,
+    paginator: Paginator = Depends(get_paginator),
+    sort: FilmListSorting | None = Query(default=None),
+    film_storage: FilmElasticStorage = Depends(get_film_elastic_storage),
+    cache: AbstractAsyncCacheStorage = Depends(get_cache_storage),
+) -> Response:
+    async def build_response() -> PersonFilmographyWithPagination:
+        query = film_storage.query().project(PersonFilm).offset((paginator.page - 1) * paginator.size)
+
+        if sort:
+            order = SortingOrders.DESC if sort == FilmListSorting.RATING_DESC else SortingOrders.ASC
+            query = query.sort(SortEntity(field_name=sort.value.lstrip("-"), order=order))
+
+        films_response = await film_storage.fetch_person_films(str(person_id), query, paginator.size)
+
+        if not films_response.entities:
+            raise_not_found(Exceptions.PERSON_FILMS_NOT_FOUND)
+
+        total_pages = get_total_pages(films_response.count, paginator.size)
+
+        return PersonFilmographyWithPagination.construct(
+            count=films_response.count,
+            count_is_exact=films_response.count_relation == CountRelations.EQ,
+            total_pages=total_pages,
+            prev=paginator.page - 1 if paginator.page > 1 else None,
+            next=paginator.page + 1 if total_pages is not None and paginator.page < total_pages else None,
+            results=[
+                PersonFilm.construct(**dict(film), roles=roles)
+                for film, roles in zip(films_response.entities, films_response.roles, strict=True)
+            ],
         )
-        for film in films
-    ]
+
+    # the ETL publishes the persons of the changed films, e.g. when the person is added to a film
+    person_films_tag = cache.get_reference_tag(FilmElasticStorage.index_name, "persons", str(person_id))
+
+    def get_filmography_tags(filmography: PersonFilmographyWithPagination) -> list[str]:
+        # a person removed from a film is not published with it, the page is evicted by the films on it
+        return [
+            person_films_tag,
+            *(cache.get_entity_tag(FilmElasticStorage.index_name, film.uuid) for film in filmography.results),
+        ]
+
+    return await cached_response(
+        request,
+        cache,
+        build_response,
+        tags=get_filmography_tags,
+        not_found_tags=[person_films_tag],
+    )
 
 
 @router.get(
@@ -91,15 +263,10 @@ async def person_films(
 async def person_details(
     person_id: UUID,
     service: PersonService = Depends(get_person_service),
-) -> Person:
+) -> Response:
     person = await service.get_person(person_id=person_id)
 
     if not person:
         raise_not_found(Exceptions.PERSON_NOT_FOUND)
 
-    return Person(
-        uuid=person.uuid,
-        full_name=person.full_name,
-        role=person.role,
-        films=person.films,
-    )
+    return model_response(person, Person)
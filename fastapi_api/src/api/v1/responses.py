@@ -0,0 +1,108 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Iterable
+
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.json import pydantic_encoder
+
+from core.config import get_settings
+from db.storage.cache.base import AbstractAsyncCacheStorage
+
+
+@lru_cache
+def get_response_fields(schema: type[BaseModel]) -> dict[str, Any]:
+    """Returns the fields of the schema and of its nested schemas in the format of `include` of `BaseModel.dict`."""
+    fields = {}
+
+    for name, field in schema.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            nested_fields = get_response_fields(field.type_)
+            fields[name] = nested_fields if field.shape == SHAPE_SINGLETON else {"__all__": nested_fields}
+        else:
+            fields[name] = ...
+
+    return fields
+
+
+def encode_response(content: BaseModel | list[BaseModel], schema: type[BaseModel] | None = None) -> bytes:
+    """
+    Encodes the models with orjson as they are, with the fields of the response schema only. The models are
+    neither rebuilt as the schema nor validated, so storage models or a page built with `construct` from them
+    are encoded directly. The schema is the type of the model by default, it is required for a list.
+    """
+    if isinstance(content, list):
+        fields = get_response_fields(schema)
+        return orjson.dumps([model.dict(include=fields) for model in content], default=pydantic_encoder)
+
+    return orjson.dumps(content.dict(include=get_response_fields(schema or type(content))), default=pydantic_encoder)
+
+
+def model_response(content: BaseModel | list[BaseModel], schema: type[BaseModel] | None = None) -> Response:
+    """
+    Returns the json response with the models encoded by `encode_response`, `response_model` of the route
+    doesn't revalidate it.
+    """
+    return Response(content=encode_response(content, schema), media_type="application/json")
+
+
+def get_response_cache_key(request: Request, cache: AbstractAsyncCacheStorage) -> str:
+    """Returns the cache key of the response: the path and the digest of the query parameters sorted by name."""
+    query_params_digest = cache.hash_cache_key_params(sorted(request.query_params.multi_items()))
+    return cache.make_key("response", request.url.path, query_params_digest)
+
+
+async def cached_response(
+    request: Request,
+    cache: AbstractAsyncCacheStorage,
+    build_response: Callable[[], Awaitable[BaseModel | list[BaseModel]]],
+    schema: type[BaseModel] | None = None,
+    ttl: int | None = None,
+    cache_key: str | None = None,
+    tags: Callable[[Any], Iterable[str]] | None = None,
+    not_found_tags: Iterable[str] = (),
+) -> Response:
+    """
+    Returns the response body from the cache as is. On a miss the response model is built, serialized and
+    the resulting bytes are saved to the cache, so a hit requires neither models construction nor validation.
+    "Not found" raised while building the response is cached for `negative_cache_ttl` seconds as well.
+
+    :param request: current request, the cache key is built from it;
+    :param cache: cache storage;
+    :param build_response: coroutine function that returns the models of the response;
+    :param schema: response schema, see `encode_response`;
+    :param ttl: duration of response caching in seconds, `default_cache_ttl` by default;
+    :param cache_key: cache key of the response, by default it is built from the request;
+    :param tags: function that returns the cache tags of the response model, e.g. of the entities it contains;
+    :param not_found_tags: cache tags of the "not found" response, e.g. of the entity that was not found;
+    :return: json response.
+    """
+    cache_key = cache_key or get_response_cache_key(request, cache)
+    body = await cache.get_raw(cache_key)
+
+    if body is None:
+
+        async def _build() -> bytes:
+            try:
+                response_model = await build_response()
+            except HTTPException as e:
+                negative_cache_ttl = get_settings().negative_cache_ttl
+
+                if e.status_code == status.HTTP_404_NOT_FOUND and negative_cache_ttl:
+                    await cache.set_not_found(cache_key, negative_cache_ttl, not_found_tags, detail=e.detail)
+
+                raise
+
+            content = encode_response(response_model, schema)
+            await cache.set_raw(
+                cache_key, content, ttl or get_settings().default_cache_ttl, tags(response_model) if tags else ()
+            )
+            return content
+
+        body = await cache.single_flight(cache_key, _build)
+
+    if cache.is_not_found(body):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=cache.get_not_found_detail(body))
+
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class FacetBucket(BaseModel):
+    value: str = Field(description="Значение, по которому можно отфильтровать результаты")
+    name: str | None = Field(description="Название значения")
+    count: int = Field(description="Количество записей с этим значением")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "value": "6f822a92-7b51-4753-8d00-ecfedf98a937",
+                "name": "Action",
+                "count": 120,
+            }
+        }
@@ -1,8 +1,9 @@
 from datetime import date
 from enum import Enum
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
+from .facets import FacetBucket
 from .genre import Genre
 from .person import BasePerson
 from .results import PaginateResultsModel
@@ -40,6 +41,18 @@ class BaseFilm(UUIDMixin):
         }
 
 
+class FilmSuggestion(UUIDMixin):
+    title: str = Field(description="Название фильма")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "uuid": "223e4317-e89b-22d3-f3b6-426614174000",
+                "title": "Billion Star Hotel",
+            }
+        }
+
+
 class Film(BaseFilm):
     description: str | None = Field(description="Описание фильма")
     genres: list[Genre] | None = Field(description="Список жанров")
@@ -74,8 +87,16 @@ class Film(BaseFilm):
         }
 
 
+class FilmFacets(BaseModel):
+    genres: list[FacetBucket] = Field(description="Количество фильмов по жанрам")
+    release_years: list[FacetBucket] = Field(description="Количество фильмов по годам выхода")
+    age_limits: list[FacetBucket] = Field(description="Количество фильмов по возрастным ограничениям")
+
+
 class FilmListWithPagination(PaginateResultsModel[BaseFilm]):
     results: list[BaseFilm] = Field(description="Список фильмов")
+    cursor: str | None = Field(description="Курсор следующей страницы при постраничном обходе курсором")
+    facets: FilmFacets | None = Field(description="Количество фильмов по значениям фильтров, с параметром `facets`")
 
     class Config:
         schema_extra = {
@@ -100,5 +121,10 @@ class FilmListWithPagination(PaginateResultsModel[BaseFilm]):
                         "age_limit": "Adults Only",
                     },
                 ],
+                "facets": {
+                    "genres": [{"value": "6f822a92-7b51-4753-8d00-ecfedf98a937", "name": "Action", "count": 120}],
+                    "release_years": [{"value": "2008", "name": None, "count": 35}],
+                    "age_limits": [{"value": "Parents Strongly Cautioned", "name": None, "count": 64}],
+                },
             }
         }
@@ -1,3 +1,4 @@
+from datetime import date
 from enum import Enum
 
 from pydantic import Field
@@ -49,8 +50,46 @@ class Person(BasePerson):
         }
 
 
+class PersonFilm(UUIDMixin):
+    title: str = Field(description="Название фильма")
+    imdb_rating: float | None = Field(description="Рейтинг фильма от 0 до 10")
+    release_date: date | None
+    roles: list[PersonRoles] = Field(description="Роли персоны в фильме")
+
+
+class PersonFilmographyWithPagination(PaginateResultsModel[PersonFilm]):
+    results: list[PersonFilm] = Field(description="Список фильмов персоны")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "count": 2,
+                "total_pages": 1,
+                "next_page": None,
+                "prev_page": None,
+                "results": [
+                    {
+                        "uuid": "223e4317-e89b-22d3-f3b6-426614174000",
+                        "title": "Billion Star Hotel",
+                        "imdb_rating": 6.1,
+                        "release_date": "2010-01-01",
+                        "roles": ["writer", "director"],
+                    },
+                    {
+                        "uuid": "118fd71b-93cd-4de5-95a4-e1485edad30e",
+                        "title": "Rogue One: A Star Wars Story",
+                        "imdb_rating": 7.8,
+                        "release_date": "2016-12-10",
+                        "roles": ["actor"],
+                    },
+                ],
+            }
+        }
+
+
 class PersonListWithPagination(PaginateResultsModel[Person]):
     results: list[Person] = Field(description="Список персон")
+    cursor: str | None = Field(description="Курсор следующей страницы при постраничном обходе курсором")
 
     class Config:
         schema_extra = {
@@ -1,3 +1,4 @@
+from math import ceil
 from typing import Generic, TypeVar
 
 from pydantic import BaseModel, Field
@@ -7,8 +8,16 @@ ResultEntityModelType = TypeVar("ResultEntityModelType", bound=BaseModel)
 
 
 class PaginateResultsModel(GenericModel, Generic[ResultEntityModelType]):
-    count: int = Field(description="Общее количество записей")
-    total_pages: int = Field(description="Общее количество страниц")
+    count: int | None = Field(description="Общее количество записей, пусто, если записи не подсчитывались")
+    count_is_exact: bool = Field(
+        default=True, description="Точное ли количество записей, иначе записей не меньше `count`"
+    )
+    total_pages: int | None = Field(description="Общее количество страниц, пусто, если записи не подсчитывались")
     prev: int | None = Field(description="Номер предыдущей страницы")
     next: int | None = Field(description="Номер следующей страницы")
     results: list[ResultEntityModelType]
+
+
+def get_total_pages(count: int | None, page_size: int) -> int | None:
+    """Returns the number of pages, None if the entities were not counted."""
+    return None if count is None else ceil(count / page_size)
@@ -0,0 +1,91 @@
+from functools import lru_cache
+
+import grpc
+import orjson
+from fastapi import Request
+from grpc_auth_service.role_service_pb2 import CheckAccessRequest
+from grpc_auth_service.role_service_pb2_grpc import AdminRoleStub
+from grpc_auth_service.utils import Constants, Metadata, Services
+from redis.asyncio import Redis
+
+from core.config import get_settings
+from db.storage.cache.access import AccessDecisionCache, AccessPoliciesListener
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+
+
+class AccessChecker:
+    """
+    Checks the access to the routes of the service with `CheckAccess` of the auth service.
+
+    The resource of the inquiry is the path template of the route, not the requested path, so the decision
+    depends only on the token, the route, the action and the client. That makes it possible to keep the decisions
+    in `decisions` and skip the call of the auth service for the repeated requests.
+    """
+
+    def __init__(self, channel: grpc.aio.Channel, decisions: AccessDecisionCache | None = None):
+        self._stub = AdminRoleStub(channel)
+        self.decisions = decisions
+
+    async def _check_access(self, token: str, path_template: str, action: str, ip: str, user_agent: str) -> bool:
+        inquiry = {
+            Constants.RESOURCE: {
+                Constants.RESOURCE_SERVICE: Services.MOVIES_SEARCH_SERVICE,
+                Constants.RESOURCE_PATH: path_template,
+            },
+            Constants.ACTION: action,
+        }
+        response = await self._stub.CheckAccess(
+            CheckAccessRequest(access_token=token, inquiry=orjson.dumps(inquiry).decode()),
+            metadata=((Metadata.IP_ADDRESS, ip), (Metadata.USER_AGENT, user_agent)),
+        )
+        return response.has_access
+
+    async def has_access(self, token: str, path_template: str, action: str, ip: str, user_agent: str) -> bool:
+        if self.decisions is None:
+            return await self._check_access(token, path_template, action, ip, user_agent)
+
+        key = self.decisions.get_key(token, path_template, action, ip, user_agent)
+        has_access = await self.decisions.get(key)
+
+        if has_access is not None:
+            return has_access
+
+        async def _load() -> bool:
+            result = await self._check_access(token, path_template, action, ip, user_agent)
+            await self.decisions.set(key, result, token)
+            return result
+
+        return await self.decisions.cache.single_flight(key, _load)
+
+
+def create_access_checker(channel: grpc.aio.Channel) -> AccessChecker:
+    """Creates the access checker, with the cache of the decisions if it is enabled in the settings."""
+    access_cache = get_settings().access_cache
+    decisions = None
+
+    if access_cache.enabled:
+        decisions = AccessDecisionCache(
+            MemoryAsyncCacheStorage(max_items=access_cache.max_items, max_bytes=access_cache.max_bytes),
+            ttl=access_cache.ttl,
+        )
+
+    return AccessChecker(channel, decisions)
+
+
+def create_access_policies_listener(client: Redis, access_checker: AccessChecker) -> AccessPoliciesListener | None:
+    """
+    Creates the listener of the access policies changes if the decisions are cached.
+    `client` must be connected to `access_cache.redis_dsn` if it is set.
+    """
+    if access_checker.decisions is None:
+        return None
+
+    return AccessPoliciesListener(
+        client, channel=get_settings().access_cache.channel, cache=access_checker.decisions.cache
+    )
+
+
+@lru_cache
+def get_access_checker(request: Request) -> AccessChecker | None:
+    """Get the access checker, None if the auth service is not configured."""
+    return getattr(request.app.state, "access_checker", None)
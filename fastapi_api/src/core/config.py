@@ -1,6 +1,7 @@
 from functools import lru_cache
 from logging import config as logging_config
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseSettings, RedisDsn, AnyHttpUrl, BaseModel, Field
 
@@ -20,12 +21,126 @@ class Jaeger(BaseModel):
     service_name: str
 
 
+class LocalCache(BaseModel):
+    enabled: bool = False
+    max_items: int = 1024
+    max_bytes: int = 16 * 1024 * 1024
+    # seconds, values read from Redis are not evicted by the cache invalidation, so they may be stale for this long
+    ttl: int = 5
+
+
+class CacheCompression(BaseModel):
+    enabled: bool = False
+    # zstd and lz4 require the optional packages, zlib is used if they are not installed
+    algorithm: Literal["zstd", "lz4", "zlib"] = "zstd"
+    # bytes, smaller values are stored as is
+    threshold: int = 1024
+    level: int | None = None
+
+
+class CacheLock(BaseModel):
+    enabled: bool = False
+    timeout: float = 10
+    blocking_timeout: float = 5
+
+
+class ElasticTimeouts(BaseModel):
+    # seconds, per type of operation
+    get: float = 2
+    search: float = 5
+    point_in_time: float = 5
+
+
+class ElasticClient(BaseModel):
+    connections_per_node: int = 10
+    http_compress: bool = False
+    request_timeout: float = 10
+    max_retries: int = 3
+    retry_on_timeout: bool = False
+    sniff_on_start: bool = False
+    sniff_on_node_failure: bool = False
+    sniff_before_requests: bool = False
+    # only applies to `sniff_before_requests`
+    min_delay_between_sniffing: float = 60
+    timeouts: ElasticTimeouts = ElasticTimeouts()
+
+
+class ElasticBatching(BaseModel):
+    enabled: bool = False
+    max_batch_size: int = 20
+    # seconds
+    max_wait: float = 0.002
+
+
+class Suggest(BaseModel):
+    cache_max_items: int = 4096
+    cache_max_bytes: int = 4 * 1024 * 1024
+    cache_ttl: int = 60
+
+
+class Export(BaseModel):
+    # documents read from ElasticSearch at a time, the memory used by an export is bounded by a batch
+    batch_size: int = 500
+    # lines sent to the client at a time
+    chunk_size: int = 100
+
+
+class CacheInvalidation(BaseModel):
+    enabled: bool = False
+    # must match the channel the ETL publishes the changed documents to
+    channel: str = "fastapi_api:invalidation"
+    # Redis the ETL publishes to (its `cache_invalidation_redis_dsn`), the Redis of the cache if not set
+    redis_dsn: RedisDsn | None = None
+
+
+class AccessCache(BaseModel):
+    enabled: bool = False
+    # seconds, a decision is never kept longer than the access token is valid. A token revoked by logout
+    # keeps its cached decision until it expires, so the token stays usable here for up to this long
+    ttl: int = 30
+    max_items: int = 10000
+    max_bytes: int = 4 * 1024 * 1024
+    # the auth service publishes to the channel when the access policies change
+    channel: str = "auth:policies"
+    # Redis of the auth service, the Redis of the cache if not set
+    redis_dsn: RedisDsn | None = None
+
+
+class Warmup(BaseModel):
+    enabled: bool = False
+    # share of the requests that are counted in the top of the requests
+    sample_rate: float = 0.1
+    max_requests: int = 1000
+    replay_limit: int = 100
+    concurrency: int = 10
+    # seconds between the warmups, only at startup if not set
+    interval: int | None = None
+    # bearer token of the replayed requests, they are denied by the access check without it
+    access_token: str | None = None
+
+
 class Settings(BaseSettings):
     testing: bool
     redis_dsn: RedisDsn
     default_cache_ttl: int
+    # duration of caching of the "not found" results, 0 disables it
+    negative_cache_ttl: int = 10
+    cache_key_namespace: str = "fastapi_api"
+    cache_key_version: int = 1
+    local_cache: LocalCache = LocalCache()
+    cache_lock: CacheLock = CacheLock()
+    cache_compression: CacheCompression = CacheCompression()
+    # msgpack requires the optional package, json is used if it is not installed
+    cache_codec: Literal["json", "msgpack"] = "json"
+    cache_invalidation: CacheInvalidation = CacheInvalidation()
     elasticsearch_dsn: AnyHttpUrl
+    elastic_client: ElasticClient = ElasticClient()
+    elastic_batching: ElasticBatching = ElasticBatching()
+    suggest: Suggest = Suggest()
+    export: Export = Export()
+    warmup: Warmup = Warmup()
     auth_service_dsn: str | None = Field(regex=r"^\w+:[0-9]{1,5}$")
+    access_cache: AccessCache = AccessCache()
     jaeger: Jaeger
 
     def __init__(self, *args, **kwargs):
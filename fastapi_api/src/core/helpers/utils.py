@@ -1,5 +1,15 @@
 import orjson
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
 
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
+
+
+def model_to_json_bytes(model: BaseModel, **kwargs) -> bytes:
+    """
+    Serializes the model to json bytes with orjson regardless of the json settings of the model.
+    Non-string dict keys are written as strings, as the standard json does.
+    """
+    return orjson.dumps(model.dict(**kwargs), default=pydantic_encoder, option=orjson.OPT_NON_STR_KEYS)
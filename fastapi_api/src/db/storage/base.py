@@ -1,8 +1,11 @@
+import base64
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Any, Iterable, Generic, TypeVar
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterable, Generic, NamedTuple, TypeVar
 
-from pydantic import BaseModel, Field, root_validator
+import orjson
+from pydantic import BaseModel, Field, create_model, root_validator
 
 from core.helpers.decorators import chain
 from core.tracer import instrumented
@@ -10,9 +13,81 @@ from core.tracer import instrumented
 IndexModelType = TypeVar("IndexModelType", bound=BaseModel)
 
 
-class EntitiesAndCountModel(BaseModel, Generic[IndexModelType]):
+def get_source_fields(model_type: type[BaseModel]) -> list[str]:
+    """Returns the names of the document fields (aliases of the model fields) that are needed to build the model."""
+    return [field.alias for field in model_type.__fields__.values()]
+
+
+@lru_cache
+def get_projection_model(model_type: type[IndexModelType], field_names: frozenset[str]) -> type[BaseModel]:
+    """Returns a model with only the specified fields of the storage model, with the same types and aliases."""
+    return create_model(
+        f"{model_type.__name__}Projection",
+        __config__=model_type.__config__,
+        **{
+            name: (field.annotation, field.field_info)
+            for name, field in model_type.__fields__.items()
+            if name in field_names
+        },
+    )
+
+
+class CountModes(str, Enum):
+    EXACT = "exact"
+    CAPPED = "capped"
+    NONE = "none"
+
+
+class CountRelations(str, Enum):
+    EQ = "eq"
+    GTE = "gte"
+
+
+class AggregationBucket(BaseModel):
+    key: Any
     count: int
+    # human-readable name of the key, if the aggregation has a label field
+    label: str | None
+
+
+class EntitiesAndCountModel(BaseModel, Generic[IndexModelType]):
+    count: int | None
+    count_relation: CountRelations = CountRelations.EQ
+    entities: list[IndexModelType]
+    aggregations: dict[str, list[AggregationBucket]] = {}
+
+
+class InvalidCursorError(ValueError):
+    """The cursor is malformed or was made for the pages of another index or sorting."""
+
+
+class Cursor(BaseModel):
+    """Position in the result set for `search_after` pagination."""
+
+    point_in_time: str | None
+    search_after: list[Any]
+    # index and sorting of the pages the cursor was made for, it doesn't continue other ones
+    scope: str | None = None
+
+    def encode(self) -> str:
+        """Returns the cursor as an opaque url-safe token."""
+        return base64.urlsafe_b64encode(orjson.dumps(self.dict())).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Restores the cursor from the token, raises InvalidCursorError if the token is malformed."""
+        try:
+            return cls.parse_raw(base64.urlsafe_b64decode(token.encode()))
+        except (TypeError, ValueError) as e:
+            raise InvalidCursorError("Malformed cursor") from e
+
+
+class EntitiesAndCursorModel(BaseModel, Generic[IndexModelType]):
+    count: int | None
+    count_relation: CountRelations = CountRelations.EQ
     entities: list[IndexModelType]
+    next_cursor: Cursor | None
+    aggregations: dict[str, list[AggregationBucket]] = {}
 
 
 class ComparisonOperators(str, Enum):
@@ -21,11 +96,20 @@ class ComparisonOperators(str, Enum):
     RANGE = "range"
 
 
+class Slot(NamedTuple):
+    """Placeholder of a value in a query structure, refers to the value by its index in the query parameters."""
+
+    index: int
+
+
 class FilterEntity(BaseModel):
     field_name: str
     comparison_operator: ComparisonOperators = ComparisonOperators.EQ
     value: Any
 
+    class Config:
+        frozen = True
+
     @root_validator()
     def validate_consistency_comparison_operator_with_value(cls, values):  # noqa: N805
         if values["comparison_operator"] == ComparisonOperators.IN:
@@ -44,7 +128,10 @@ class LogicalGroupOperators(str, Enum):
 
 class FilterGroup(BaseModel):
     logical_group_operator: LogicalGroupOperators
-    entities: list["FilterEntity | FilterGroup"]
+    entities: tuple["FilterEntity | FilterGroup", ...]
+
+    class Config:
+        frozen = True
 
 
 FilterGroup.update_forward_refs()
@@ -59,25 +146,112 @@ class SortEntity(BaseModel):
     field_name: str
     order: SortingOrders = SortingOrders.ASC
 
+    class Config:
+        frozen = True
+
 
 class SearchTypes(str, Enum):
     FUZZY = "fuzzy search"
     CLEAR = "clear search"
+    PREFIX = "prefix search"
 
 
 class SearchString(BaseModel):
     search_string: str = Field(min_length=1)
-    search_fields: list[str]
+    search_fields: tuple[str, ...]
     type_search: SearchTypes
 
+    class Config:
+        frozen = True
+
+
+class AggregationTypes(str, Enum):
+    TERMS = "terms"
+    YEAR_HISTOGRAM = "year histogram"
+
+
+class AggregationEntity(BaseModel):
+    """
+    Buckets of the entities matching the query, counted along with the entities by the same request.
+    `label_field` is a field next to `field_name` with the name of the bucket key, e.g. `genres.name` for `genres.id`.
+    """
+
+    name: str
+    field_name: str
+    aggregation_type: AggregationTypes = AggregationTypes.TERMS
+    size: int = 10
+    label_field: str | None = None
+
+    class Config:
+        frozen = True
+
+
+class QueryStructure(NamedTuple):
+    """
+    Hashable shape of the query: the filter and the search string with all the values replaced by slots.
+    Queries that differ only in values have the same structure, so the structure is used as a key of compiled queries.
+    """
+
+    filter_: FilterGroup | FilterEntity | None
+    search_query_: SearchString | None
+
+
+def parametrize_filter(
+    filter_: FilterGroup | FilterEntity | None, params: list[Any]
+) -> FilterGroup | FilterEntity | None:
+    """Returns a copy of the filter with the values replaced by slots, the values are appended to `params`."""
+    if filter_ is None:
+        return None
+
+    if isinstance(filter_, FilterGroup):
+        return FilterGroup.construct(
+            logical_group_operator=filter_.logical_group_operator,
+            entities=tuple(parametrize_filter(filter_entity, params) for filter_entity in filter_.entities),
+        )
+
+    if filter_.comparison_operator == ComparisonOperators.RANGE:
+        value = (Slot(len(params)), Slot(len(params) + 1))
+        params.extend(filter_.value)
+    else:
+        value = Slot(len(params))
+        params.append(filter_.value)
+
+    return FilterEntity.construct(
+        field_name=filter_.field_name, comparison_operator=filter_.comparison_operator, value=value
+    )
+
+
+def render_template(template: Any, params: list[Any]) -> Any:
+    """Returns a copy of the compiled query template with the slots replaced by the values from `params`."""
+    if isinstance(template, Slot):
+        return params[template.index]
+
+    if isinstance(template, dict):
+        return {key: render_template(value, params) for key, value in template.items()}
+
+    if isinstance(template, list):
+        return [render_template(value, params) for value in template]
+
+    return template
+
 
 class QueryBuilder(Generic[IndexModelType]):
-    """A class for building queries to get data from storage."""
+    """
+    A class for building queries to get data from storage.
+
+    Every method returns a new builder, and all the parts of the query are immutable,
+    so builders derived from the same one never share state.
+    """
 
     filter_: FilterGroup | FilterEntity | None = None
-    sorts_: list[SortEntity] | None = None
+    sorts_: tuple[SortEntity, ...] | None = None
     search_query_: SearchString | None = None
     offset_: int = 0
+    cursor_: Cursor | None = None
+    projection_: type[BaseModel] | None = None
+    count_mode_: CountModes = CountModes.CAPPED
+    count_limit_: int = 10000
+    aggregations_: tuple[AggregationEntity, ...] = ()
 
     def __init__(self, storage: "BaseStorage[IndexModelType]"):
         self.storage = storage
@@ -95,15 +269,15 @@ class QueryBuilder(Generic[IndexModelType]):
             and isinstance(filter_entity, FilterEntity)
             and self.filter_.logical_group_operator == group_operator
         ):
-            self.filter_.entities.append(filter_entity)
+            self.filter_ = FilterGroup(
+                logical_group_operator=group_operator, entities=(*self.filter_.entities, filter_entity)
+            )
         else:
-            self.filter_ = FilterGroup(logical_group_operator=group_operator, entities=[self.filter, filter_entity])
+            self.filter_ = FilterGroup(logical_group_operator=group_operator, entities=(self.filter_, filter_entity))
 
     @chain
     def sort(self, *sorts: SortEntity):
-        if self.sorts_ is None:
-            self.sorts_ = []
-        self.sorts_.extend(sorts)
+        self.sorts_ = (*(self.sorts_ or ()), *sorts)
 
     @chain
     def search(self, search_query: SearchString):
@@ -113,6 +287,46 @@ class QueryBuilder(Generic[IndexModelType]):
     def offset(self, offset: int):
         self.offset_ = offset
 
+    @chain
+    def count(self, mode: CountModes, limit: int | None = None):
+        """
+        Sets how the total number of matching entities is counted: exactly, up to the `limit` (the count is
+        then a lower bound when more entities match) or not at all. `fetch` never counts.
+        """
+        self.count_mode_ = mode
+        if limit is not None:
+            self.count_limit_ = limit
+
+    @chain
+    def project(self, schema: type[BaseModel]):
+        """
+        Limits the fetched document fields to the fields of the schema (matched by name with the storage model).
+        Entities are returned as a projection model that contains only these fields.
+        """
+        self.projection_ = get_projection_model(self.storage.model_type, frozenset(schema.__fields__))
+
+    @chain
+    def aggregate(self, *aggregations: AggregationEntity):
+        """Requests the buckets of the aggregations with the entities. `fetch` doesn't return them."""
+        self.aggregations_ = (*self.aggregations_, *aggregations)
+
+    @chain
+    def after(self, cursor: Cursor | None):
+        """Sets the position from which `fetch_next` continues. `None` starts from the beginning."""
+        self.cursor_ = cursor
+
+    def parametrize(self) -> tuple[QueryStructure, list[Any]]:
+        """Returns the structure of the query and the values for its slots."""
+        params = []
+        filter_ = parametrize_filter(self.filter_, params)
+        search_query = None
+
+        if self.search_query_ is not None:
+            search_query = SearchString.construct(**{**self.search_query_.dict(), "search_string": Slot(len(params))})
+            params.append(self.search_query_.search_string)
+
+        return QueryStructure(filter_=filter_, search_query_=search_query), params
+
     @instrumented
     async def fetch(self, batch_size: int = 50) -> list[IndexModelType]:
         """Calls the method of the same name from the storage class."""
@@ -123,6 +337,15 @@ class QueryBuilder(Generic[IndexModelType]):
         """Calls the method of the same name from the storage class."""
         return await self.storage.fetch_count(self, batch_size)
 
+    @instrumented
+    async def fetch_next(self, batch_size: int = 50) -> EntitiesAndCursorModel[IndexModelType]:
+        """Calls the method of the same name from the storage class."""
+        return await self.storage.fetch_next(self, batch_size)
+
+    def scan(self, batch_size: int = 500) -> AsyncIterator[tuple[IndexModelType, Cursor]]:
+        """Calls the method of the same name from the storage class."""
+        return self.storage.scan(self, batch_size)
+
 
 class AbstractBaseStorage(ABC):
     def __init__(self, client: any):
@@ -146,6 +369,11 @@ class BaseStorage(AbstractBaseStorage, Generic[IndexModelType]):
     async def get_entity(self, key: str) -> IndexModelType:
         raise NotImplementedError
 
+    @abstractmethod
+    async def get_entities(self, keys: list[str]) -> list[IndexModelType | None]:
+        """Returns entities in the order of the keys, None for the keys that are not found."""
+        raise NotImplementedError
+
     @abstractmethod
     async def fetch(
         self, query: QueryBuilder[IndexModelType] | None = None, batch_size: int = 50
@@ -158,5 +386,25 @@ class BaseStorage(AbstractBaseStorage, Generic[IndexModelType]):
     ) -> EntitiesAndCountModel[IndexModelType] | None:
         raise NotImplementedError
 
+    @abstractmethod
+    async def fetch_next(
+        self, query: QueryBuilder[IndexModelType], batch_size: int = 50
+    ) -> EntitiesAndCursorModel[IndexModelType]:
+        """
+        Returns the page that follows `query.cursor_` and the cursor of the next page.
+        The cost of the page doesn't depend on its depth, unlike `offset` pagination.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def scan(
+        self, query: QueryBuilder[IndexModelType], batch_size: int = 500
+    ) -> AsyncIterator[tuple[IndexModelType, Cursor]]:
+        """
+        Iterates over all the entities after `query.cursor_`, each one with the cursor that resumes after it.
+        Unlike `fetch_next` the whole result set is read, so the entities are not counted.
+        """
+        raise NotImplementedError
+
     def query(self) -> QueryBuilder[IndexModelType]:
         return QueryBuilder(self)
@@ -1,8 +1,92 @@
 from fastapi import Request
+from redis.asyncio import Redis
 
 from functools import lru_cache
 
+from core.config import get_settings
 from db.storage.cache.base import AbstractAsyncCacheStorage
+from db.storage.cache.codecs import CodecNames, get_codec
+from db.storage.cache.compression import CompressionAlgorithms, Compressor
+from db.storage.cache.invalidation import CacheInvalidationListener
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+from db.storage.cache.redis import RedisAsyncCacheStorage
+from db.storage.cache.tiered import TieredAsyncCacheStorage
+from db.storage.cache.warmup import PopularRequests
+
+
+def create_cache_storage(client: Redis) -> AbstractAsyncCacheStorage:
+    """Creates the cache storage according to the settings: Redis, optionally with the in-memory tier in front."""
+    settings = get_settings()
+    compression = settings.cache_compression
+    storage = RedisAsyncCacheStorage(
+        client,
+        key_prefix=f"{settings.cache_key_namespace}:v{settings.cache_key_version}",
+        lock_timeout=settings.cache_lock.timeout if settings.cache_lock.enabled else None,
+        lock_blocking_timeout=settings.cache_lock.blocking_timeout,
+        compressor=(
+            Compressor(
+                CompressionAlgorithms(compression.algorithm),
+                threshold=compression.threshold,
+                level=compression.level,
+            )
+            if compression.enabled
+            else None
+        ),
+        codec=get_codec(CodecNames(settings.cache_codec)),
+    )
+    local_cache = settings.local_cache
+
+    if not local_cache.enabled:
+        return storage
+
+    return TieredAsyncCacheStorage(
+        local=MemoryAsyncCacheStorage(max_items=local_cache.max_items, max_bytes=local_cache.max_bytes),
+        remote=storage,
+        local_ttl=local_cache.ttl,
+    )
+
+
+def create_cache_invalidation_listener(
+    client: Redis, cache: AbstractAsyncCacheStorage
+) -> CacheInvalidationListener | None:
+    """
+    Creates the listener of the ETL changes if the cache invalidation is enabled in the settings.
+    `client` must be connected to `cache_invalidation.redis_dsn` if it is set.
+    """
+    invalidation = get_settings().cache_invalidation
+
+    if not invalidation.enabled:
+        return None
+
+    return CacheInvalidationListener(client, channel=invalidation.channel, cache=cache)
+
+
+def create_popular_requests(client: Redis) -> PopularRequests | None:
+    """Creates the top of the requests for the cache warmup if the warmup is enabled in the settings."""
+    settings = get_settings()
+
+    if not settings.warmup.enabled:
+        return None
+
+    return PopularRequests(
+        client,
+        key=f"{settings.cache_key_namespace}:warmup:requests",
+        sample_rate=settings.warmup.sample_rate,
+        max_size=settings.warmup.max_requests,
+    )
+
+
+@lru_cache
+def get_popular_requests(request: Request) -> PopularRequests | None:
+    """Get the top of the requests, None if the warmup is disabled."""
+    return getattr(request.app.state, "popular_requests", None)
+
+
+@lru_cache
+def get_suggest_cache_storage() -> MemoryAsyncCacheStorage:
+    """Get the per-worker cache of the suggestions by prefix."""
+    suggest = get_settings().suggest
+    return MemoryAsyncCacheStorage(max_items=suggest.cache_max_items, max_bytes=suggest.cache_max_bytes)
 
 
 @lru_cache
@@ -0,0 +1,73 @@
+import base64
+import time
+
+import orjson
+from pydantic import BaseModel
+
+from db.storage.cache.invalidation import CacheInvalidationListener
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+
+
+class AccessDecision(BaseModel):
+    has_access: bool
+
+
+def get_token_expiration(token: str) -> float | None:
+    """
+    Returns the `exp` claim of the JWT without verifying the token, None if there is no such claim.
+    The signature is verified by the auth service, the claim only limits the time the decision is cached.
+    """
+    # non-ascii payloads, invalid base64 (`binascii.Error`) and invalid json (`orjson.JSONDecodeError`) are ValueErrors
+    try:
+        payload = token.split(".")[1]
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+
+    expiration = claims.get("exp") if isinstance(claims, dict) else None
+    return float(expiration) if isinstance(expiration, (int, float)) else None
+
+
+class AccessDecisionCache:
+    """
+    Per-worker cache of the decisions of the auth service. A decision is kept for `ttl` seconds,
+    but not longer than the access token is valid. Logout is not published by the auth service, so a revoked token
+    is still allowed here until its cached decision expires.
+    """
+
+    def __init__(self, cache: MemoryAsyncCacheStorage, ttl: int):
+        self.cache = cache
+        self.ttl = ttl
+
+    def get_key(self, token: str, path_template: str, action: str, ip: str, user_agent: str) -> str:
+        # the token is a part of the digest, so it is not kept in memory as is
+        return self.cache.make_key(
+            "access", self.cache.hash_cache_key_params([token, path_template, action, ip, user_agent])
+        )
+
+    def get_ttl(self, token: str) -> int:
+        expiration = get_token_expiration(token) if token else None
+
+        if expiration is None:
+            return self.ttl
+
+        return min(self.ttl, int(expiration - time.time()))
+
+    async def get(self, key: str) -> bool | None:
+        decision = await self.cache.get(key, AccessDecision)
+        return None if decision is None else decision.has_access
+
+    async def set(self, key: str, has_access: bool, token: str):
+        ttl = self.get_ttl(token)
+
+        if ttl > 0:
+            await self.cache.set(key, AccessDecision(has_access=has_access), ttl)
+
+
+class AccessPoliciesListener(CacheInvalidationListener):
+    """Drops all the cached decisions when the auth service publishes that the access policies have changed."""
+
+    cache: MemoryAsyncCacheStorage
+
+    async def _handle(self, data: bytes | str):
+        await self.cache.clear()
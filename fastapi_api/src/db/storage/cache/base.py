@@ -1,96 +1,433 @@
+import asyncio
+import hashlib
+import inspect
+import logging
+import math
+import random
+import time
 from abc import abstractmethod
-from datetime import date, datetime
 from functools import wraps
 from itertools import chain
-from typing import Callable, Any, Coroutine
-from uuid import UUID
+from typing import Awaitable, Callable, Any, Coroutine, Generic, Iterable
 
+import orjson
 from pydantic import BaseModel
+from pydantic.generics import GenericModel
 
 from db.storage.base import IndexModelType, AbstractBaseStorage
 
+logger = logging.getLogger(__name__)
+
+# first byte of the values stored instead of the missing ones (negative caching), it never starts a json
+NOT_FOUND_SENTINEL = b"\x00"
+
+
+class CacheStats(BaseModel):
+    """Hit/miss counters of a cache tier."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def register(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+
+class CacheEnvelope(GenericModel, Generic[IndexModelType]):
+    """A cached value with the time until which it is considered fresh."""
+
+    value: IndexModelType
+    fresh_until: float
+    delta: float
+
+    def should_refresh(self, beta: float) -> bool:
+        """
+        Probabilistic early expiration (XFetch): the closer the value is to the end of its freshness and
+        the longer it took to compute, the more likely the value is to be recomputed before it becomes stale.
+        """
+        return time.time() - self.delta * beta * math.log(1.0 - random.random()) >= self.fresh_until
+
 
 class AbstractAsyncCacheStorage(AbstractBaseStorage):
     """Abstract class for caching Pydantic-model."""
 
+    tier_name: str = "cache"
+
+    def __init__(self, client: any, key_prefix: str = ""):
+        super().__init__(client)
+        self.key_prefix = key_prefix
+        self.stats = CacheStats()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def get_stats(self) -> dict[str, CacheStats]:
+        """Returns the hit/miss counters of the storage keyed by the name of the cache tier."""
+        return {self.tier_name: self.stats}
+
     @abstractmethod
-    async def set(self, key: str, value: IndexModelType, ttl: int):
+    async def set(self, key: str, value: IndexModelType, ttl: int, tags: Iterable[str] = ()):
         """
         An abstract set method that should store the value of the
         Pydantic model in the child class by the specified key.
+        The key is added to the `tags`, so it is removed by `invalidate_tags` of any of them.
         """
         raise NotImplementedError
 
     @abstractmethod
-    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | None:
-        """An abstract get method that should return the Pydantic model from the key storage in the child class."""
+    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | bytes | None:
+        """
+        An abstract get method that should return the Pydantic model from the key storage in the child class.
+        A negative cache entry (see `set_not_found`) should be returned as is.
+        """
         raise NotImplementedError
 
-    @classmethod
-    def serialize_cached_function_param(cls, param: any, separator_for_mapping_param: str = "___") -> str | None:
-        """
-        Serializes parameters of arbitrary type in str if possible. If it is not possible, None is returned.
-
-        :param param: the value of the parameter to be serialized;
-        :param separator_for_mapping_param: separator for serialization of child parameter fields;
-        :return: a parameter serialized to a string or None if serialization is not possible.
-        """
-        if isinstance(param, (str, int, float, UUID)):
-            return str(param)
-        elif isinstance(param, (date, datetime)):
-            return param.isoformat()
-        elif isinstance(param, (dict, BaseModel)) and len(separator_for_mapping_param) < 10:
-            if isinstance(param, BaseModel):
-                param = param.dict()
-            keys_values = []
-            for key, value in param.items():
-                serialized_value = cls.serialize_cached_function_param(value, separator_for_mapping_param + "_")
-                if serialized_value is None:
-                    continue
-                keys_values.append(f"{key} === {serialized_value}")
-            return separator_for_mapping_param.join(keys_values)
-
-        return None
+    @abstractmethod
+    async def set_raw(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()):
+        """An abstract method that should store already serialized bytes by the specified key and tag it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_raw(self, key: str) -> bytes | None:
+        """An abstract method that should return bytes stored by `set_raw` without parsing them."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        """An abstract method that should remove the values stored by the keys."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def invalidate_tags(self, *tags: str):
+        """An abstract method that should remove the values stored with any of the tags."""
+        raise NotImplementedError
+
+    async def set_many(self, values: dict[str, IndexModelType], ttl: int, tags: Iterable[str] = ()):
+        """Stores several values at once. Storages that support batch writes should override it."""
+        for key, value in values.items():
+            await self.set(key, value, ttl, tags)
+
+    async def set_not_found(self, key: str, ttl: int, tags: Iterable[str] = (), detail: str = ""):
+        """
+        Remembers that there is no value for the key, so the lookup is not repeated for `ttl` seconds.
+        `get` and `get_raw` return the sentinel for such a key, `detail` is kept after it.
+        """
+        await self.set_raw(key, NOT_FOUND_SENTINEL + detail.encode(), ttl, tags)
+
+    async def set_many_not_found(self, keys: list[str], ttl: int):
+        """Remembers several missing values at once. Storages that support batch writes should override it."""
+        for key in keys:
+            await self.set_not_found(key, ttl)
+
+    @staticmethod
+    def is_not_found(value: Any) -> bool:
+        """Whether the value read from the cache is a negative cache entry."""
+        return isinstance(value, bytes) and value.startswith(NOT_FOUND_SENTINEL)
+
+    @staticmethod
+    def get_not_found_detail(value: bytes) -> str:
+        """Returns the detail saved by `set_not_found` with the negative cache entry."""
+        return value[len(NOT_FOUND_SENTINEL) :].decode()
+
+    async def get_many(self, keys: list[str], model_type: type[IndexModelType]) -> list[IndexModelType | bytes | None]:
+        """Returns values in the order of the keys. Storages that support batch reads should override it."""
+        return [await self.get(key, model_type) for key in keys]
+
+    @staticmethod
+    def normalize_cached_function_param(param: Any) -> Any:
+        """
+        Converts a parameter that orjson can't serialize natively to a serializable value.
+
+        Pydantic models are replaced by their fields, sets by sorted lists. Other objects raise TypeError:
+        reducing them to their type would make the keys of different calls collide.
+        """
+        if isinstance(param, BaseModel):
+            # the nested models are normalized in turn, so the fields are not copied recursively by `dict()`
+            return dict(param)
+        elif isinstance(param, (set, frozenset)):
+            return sorted(param, key=repr)
+
+        raise TypeError(f"{type(param).__qualname__} is not a cache key parameter, exclude it from the parameters")
+
+    @staticmethod
+    def hash_cache_key_params(params: Any) -> str:
+        """Returns a fixed-length digest of the canonical (sorted keys) json representation of the parameters."""
+        encoded_params = orjson.dumps(
+            params,
+            default=AbstractAsyncCacheStorage.normalize_cached_function_param,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+        return hashlib.blake2b(encoded_params, digest_size=16).hexdigest()
+
+    def make_key(self, *parts: str) -> str:
+        """Joins the parts of the key, prefixing them with the namespace of the storage."""
+        return ":".join(chain([self.key_prefix] if self.key_prefix else [], parts))
 
     @classmethod
     def get_cache_key(cls, func: callable, *args, **kwargs) -> str:
         """
-        Returns the key value by the function name and the value of its parameters.
-        The key contains only parameters that have one of the types: str, int, float, date, datetime.
+        Returns the key value by the function name and the digest of its parameters,
+        without the namespace of the storage, `make_key` adds it.
+
+        `Example:`
+            `services.film.FilmService.get_film:5c8d0ae0b1f2e4c3a6b7d8e9f0a1b2c3`
         """
-        prefix_cache_key = ".".join([func.__module__, func.__qualname__])
-        params_cache_key = [
-            cls.serialize_cached_function_param(func_param) for func_param in chain(args, kwargs.values())
-        ]
-        return "__".join(chain([prefix_cache_key], [key for key in params_cache_key if key is not None]))
+        return ":".join([".".join([func.__module__, func.__qualname__]), cls.hash_cache_key_params([args, kwargs])])
+
+    def get_entity_cache_key(self, index_name: str, entity_id: str) -> str:
+        """Returns the key of the entity cached by `get_many_or_load`."""
+        return self.make_key("entity", index_name, str(entity_id))
 
-    def cache_decorator(self, model_type: type[IndexModelType], ttl: int) -> Callable[[..., IndexModelType], Callable]:
+    def get_tag_key(self, tag: str) -> str:
+        """Returns the key of the set of the keys stored with the tag."""
+        return self.make_key("tag", tag)
+
+    @staticmethod
+    def get_entity_tag(index_name: str, entity_id: str) -> str:
+        """Returns the tag of the values that contain the entity, e.g. of the list pages with the film."""
+        return f"{index_name}:{entity_id}"
+
+    @staticmethod
+    def get_reference_tag(index_name: str, reference: str, entity_id: str) -> str:
+        """
+        Returns the tag of the values built from the documents of the index that refer to the entity,
+        e.g. of the filmography pages of the person, `reference` names the referred entities, e.g. "persons".
+        """
+        return f"{index_name}:{reference}:{entity_id}"
+
+    @staticmethod
+    def get_index_tag(index_name: str) -> str:
+        """Returns the tag of the values that any change of the index can make stale, e.g. of the list pages."""
+        return index_name
+
+    @staticmethod
+    def get_not_found_tag(index_name: str) -> str:
+        """Returns the tag of the negative cache entries that any new document of the index can make stale."""
+        return f"{index_name}:not-found"
+
+    async def get_many_or_load(
+        self,
+        index_name: str,
+        ids: list[str],
+        model_type: type[IndexModelType],
+        loader: Callable[[list[str]], Awaitable[list[IndexModelType | None]]],
+        ttl: int,
+        negative_ttl: int | None = None,
+    ) -> list[IndexModelType | None]:
+        """
+        Returns entities by ids in a batch: the cached ones are read at once, only the missing ones are loaded
+        with a single call of the loader and saved to the cache at once.
+
+        :param index_name: name of the index, a part of the entity keys;
+        :param ids: ids of the entities;
+        :param model_type: Pydantic model Class for parsing;
+        :param loader: coroutine function that returns entities (or None) in the order of the passed ids;
+        :param ttl: duration of record caching in seconds;
+        :param negative_ttl: duration in seconds for which the ids that are not found are not loaded again;
+        :return: entities in the order of the ids, None for the ids that are not found.
+        """
+        keys = [self.get_entity_cache_key(index_name, entity_id) for entity_id in ids]
+        entities = await self.get_many(keys, model_type)
+        missing_ids = [entity_id for entity_id, entity in zip(ids, entities, strict=True) if entity is None]
+
+        if missing_ids:
+            loaded = dict(zip(missing_ids, await loader(missing_ids), strict=True))
+            found = {
+                self.get_entity_cache_key(index_name, entity_id): entity
+                for entity_id, entity in loaded.items()
+                if entity is not None
+            }
+            not_found = [
+                self.get_entity_cache_key(index_name, entity_id)
+                for entity_id, entity in loaded.items()
+                if entity is None
+            ]
+
+            if found:
+                await self.set_many(found, ttl)
+
+            if not_found and negative_ttl:
+                await self.set_many_not_found(not_found, negative_ttl)
+
+            entities = [
+                entity if entity is not None else loaded[entity_id]
+                for entity_id, entity in zip(ids, entities, strict=True)
+            ]
+
+        return [None if self.is_not_found(entity) else entity for entity in entities]
+
+    async def single_flight(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs the loader only once per key within the worker: concurrent callers with the same key
+        await the result of the call that is already in progress.
+
+        :param key: key of the call;
+        :param loader: coroutine function to be called;
+        :return: result of the loader.
+        """
+        task = self._in_flight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # shield the shared call from the cancellation of one of the callers
+        return await asyncio.shield(task)
+
+    async def _load_exclusively(
+        self, key: str, model_type: type[IndexModelType], loader: Callable[[], Awaitable[IndexModelType | None]]
+    ) -> IndexModelType | None:
+        """
+        Hook to serialize loading of the value across workers. By default, the loader is just called.
+
+        :param key: cache key of the value;
+        :param model_type: Pydantic model Class for parsing;
+        :param loader: coroutine function that loads the value and saves it to the cache.
+        """
+        return await loader()
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Runs the loader in a background task, unless the value is already being loaded."""
+        if key in self._in_flight:
+            return
+
+        task = asyncio.ensure_future(self.single_flight(key, loader))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+
+    def _on_background_task_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background refresh of the cache failed", exc_info=task.exception())
+
+    async def _get_or_load_with_stale(
+        self,
+        key: str,
+        model_type: type[IndexModelType],
+        ttl: int,
+        stale_ttl: int,
+        beta: float,
+        loader: Callable[[], Awaitable[IndexModelType | None]],
+        tags: Callable[[IndexModelType], Iterable[str]] | None = None,
+        negative_ttl: int | None = None,
+    ) -> IndexModelType | None:
+        """
+        Returns the cached value even if it is stale (but not older than `stale_ttl`) and refreshes it in the
+        background when it is stale or when XFetch decides to recompute it early.
+        """
+        envelope_type = CacheEnvelope[model_type]
+
+        async def _load() -> CacheEnvelope[IndexModelType] | None:
+            started_at = time.monotonic()
+            value = await loader()
+
+            if value is None:
+                if negative_ttl:
+                    await self.set_not_found(key, negative_ttl)
+                return None
+
+            envelope = envelope_type(value=value, fresh_until=time.time() + ttl, delta=time.monotonic() - started_at)
+            await self.set(key, envelope, ttl + stale_ttl, tags(value) if tags else ())
+            return envelope
+
+        envelope = await self.get(key, envelope_type)
+
+        if self.is_not_found(envelope):
+            return None
+
+        if envelope is not None:
+            if envelope.should_refresh(beta):
+                self._refresh_in_background(key, _load)
+
+            return envelope.value
+
+        envelope = await self.single_flight(key, lambda: self._load_exclusively(key, envelope_type, _load))
+        return None if envelope is None or self.is_not_found(envelope) else envelope.value
+
+    def cache_decorator(
+        self,
+        model_type: type[IndexModelType],
+        ttl: int,
+        stale_ttl: int | None = None,
+        beta: float = 1.0,
+        tags: Callable[[IndexModelType], Iterable[str]] | None = None,
+        negative_ttl: int | None = None,
+    ) -> Callable[[..., IndexModelType], Callable]:
         """
         A decorator that caches the values of the Pydantic-model functions in the specified storage and,
-        if available, retrieves the values from the cache.
+        if available, retrieves the values from the cache. Concurrent misses of the same key are coalesced
+        into a single call of the function.
+
+        The key is built from the arguments of the call except the instance of a method (`self` or `cls`),
+        the arguments must be serializable by `hash_cache_key_params`.
+
+        If `stale_ttl` is set, the value is fresh for `ttl` seconds and is kept for `stale_ttl` seconds more:
+        during that time it is still returned while being refreshed in the background.
+
+        If `negative_ttl` is set, None returned by the function is cached as well, e.g. for the entities
+        that are not found, so they are not looked up on every call.
 
         :param model_type: Pydantic model Class for parsing;
         :param ttl: duration of record caching in seconds;
+        :param stale_ttl: duration in seconds for which the stale record can be returned;
+        :param beta: XFetch coefficient, values greater than 1 make early recomputation more likely;
+        :param tags: function that returns the tags of the value, e.g. the tags of the entities it contains;
+        :param negative_ttl: duration in seconds for which None returned by the function is cached;
         :return: wrap-function.
         """
 
         def _decorator(
             method: Callable,
         ) -> Callable[[tuple[Any, ...], dict[str, Any]], Coroutine[Any, Any, IndexModelType]]:
+            # the instance of a service doesn't describe the result of the call, it is not a part of the key
+            skipped_args = 1 if next(iter(inspect.signature(method).parameters), None) in ("self", "cls") else 0
+
             @wraps(method)
             async def _method(*args, **kwargs) -> IndexModelType | None:
-                cache_key = self.get_cache_key(_method, *args, **kwargs)
+                cache_key = self.make_key(self.get_cache_key(_method, *args[skipped_args:], **kwargs))
+
+                if stale_ttl is not None:
+                    return await self._get_or_load_with_stale(
+                        cache_key,
+                        model_type,
+                        ttl,
+                        stale_ttl,
+                        beta,
+                        lambda: method(*args, **kwargs),
+                        tags,
+                        negative_ttl,
+                    )
+
                 result = await self.get(cache_key, model_type)
 
+                if self.is_not_found(result):
+                    return None
+
                 if result:
                     return result
 
-                result = await method(*args, **kwargs)
+                async def _load() -> IndexModelType | None:
+                    value = await method(*args, **kwargs)
+
+                    if value is not None:
+                        await self.set(cache_key, value, ttl, tags(value) if tags else ())
+                    elif negative_ttl:
+                        await self.set_not_found(cache_key, negative_ttl)
 
-                if result is not None:
-                    await self.set(cache_key, result, ttl)
+                    return value
 
-                return result
+                result = await self.single_flight(
+                    cache_key, lambda: self._load_exclusively(cache_key, model_type, _load)
+                )
+                return None if self.is_not_found(result) else result
 
             return _method
 
@@ -0,0 +1,111 @@
+import logging
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+import orjson
+from pydantic import parse_obj_as, parse_raw_as
+from pydantic.json import pydantic_encoder
+
+from core.helpers.utils import model_to_json_bytes
+from db.storage.base import IndexModelType
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class CodecNames(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+class CacheCodec(ABC):
+    """
+    Serializes Pydantic models to the bytes stored in the cache. Each codec but json prefixes the bytes
+    with its id, so values written by different codecs can be read during a gradual rollout of a codec.
+    """
+
+    name: CodecNames
+    codec_id: bytes
+
+    @abstractmethod
+    def encode(self, value: IndexModelType) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def decode(self, data: bytes, model_type: type[IndexModelType]) -> IndexModelType:
+        """Parses the bytes returned by `encode` without the codec id."""
+        raise NotImplementedError
+
+
+class JsonCodec(CacheCodec):
+    """Json is stored as is, without the codec id, so the values written before codecs were introduced are json."""
+
+    name = CodecNames.JSON
+    codec_id = b""
+
+    def encode(self, value: IndexModelType) -> bytes:
+        # the json settings of the model are not used: generic models like `CacheEnvelope` keep the default ones
+        return model_to_json_bytes(value, by_alias=True)
+
+    def decode(self, data: bytes, model_type: type[IndexModelType]) -> IndexModelType:
+        return parse_raw_as(model_type, data, json_loads=orjson.loads)
+
+
+def msgpack_default(value: Any) -> Any:
+    """Converts the types msgpack does not support, the most frequent ones are checked before `pydantic_encoder`."""
+    if isinstance(value, UUID):
+        return str(value)
+    elif isinstance(value, (date, datetime)):
+        return value.isoformat()
+
+    return pydantic_encoder(value)
+
+
+class MsgpackCodec(CacheCodec):
+    """
+    Compact binary codec, requires the optional `msgpack` package. The values are smaller than json, but not
+    faster to encode or decode: most of the time of both codecs is spent in pydantic `.dict()` and validation.
+    """
+
+    name = CodecNames.MSGPACK
+    codec_id = b"\x10"
+
+    def encode(self, value: IndexModelType) -> bytes:
+        return self.codec_id + msgpack.packb(value.dict(by_alias=True), default=msgpack_default)
+
+    def decode(self, data: bytes, model_type: type[IndexModelType]) -> IndexModelType:
+        # the keys of the dict fields are not always strings, e.g. the years of a histogram
+        return parse_obj_as(model_type, msgpack.unpackb(data, strict_map_key=False))
+
+
+# ids of the codecs are kept apart from the headers of the compressed values and the negative cache entries
+CODECS_BY_ID = {MsgpackCodec.codec_id: MsgpackCodec()}
+DEFAULT_CODEC = JsonCodec()
+
+
+def get_codec(name: CodecNames) -> CacheCodec:
+    """Returns the codec by name, json if the package of the codec is not installed."""
+    if name == CodecNames.MSGPACK:
+        if msgpack is not None:
+            return CODECS_BY_ID[MsgpackCodec.codec_id]
+
+        logger.warning("Codec `%s` is not installed, json is used instead", name.value)
+
+    return DEFAULT_CODEC
+
+
+def decode(data: bytes, model_type: type[IndexModelType]) -> IndexModelType:
+    """Parses the value written by any of the codecs, choosing the codec by the id."""
+    codec = CODECS_BY_ID.get(data[:1])
+
+    if codec is None:
+        return DEFAULT_CODEC.decode(data, model_type)
+
+    return codec.decode(data[1:], model_type)
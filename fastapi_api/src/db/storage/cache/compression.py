@@ -0,0 +1,98 @@
+import logging
+import zlib
+from enum import Enum
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+
+class CompressionAlgorithms(str, Enum):
+    ZSTD = "zstd"
+    LZ4 = "lz4"
+    ZLIB = "zlib"
+
+
+# first byte of a compressed value. Uncompressed values are json, they start with a printable character,
+# and the negative cache entries start with zero, so the values stored before compression was enabled
+# stay readable
+COMPRESSION_HEADERS = {
+    CompressionAlgorithms.ZLIB: b"\x01",
+    CompressionAlgorithms.ZSTD: b"\x02",
+    CompressionAlgorithms.LZ4: b"\x03",
+}
+ALGORITHMS_BY_HEADER = {header: algorithm for algorithm, header in COMPRESSION_HEADERS.items()}
+# levels used when the level is not set, zero is a valid level of every algorithm
+DEFAULT_LEVELS = {
+    CompressionAlgorithms.ZLIB: zlib.Z_DEFAULT_COMPRESSION,
+    CompressionAlgorithms.ZSTD: 3,
+    CompressionAlgorithms.LZ4: 0,
+}
+
+
+def is_algorithm_available(algorithm: CompressionAlgorithms) -> bool:
+    return {
+        CompressionAlgorithms.ZSTD: zstandard is not None,
+        CompressionAlgorithms.LZ4: lz4_frame is not None,
+        CompressionAlgorithms.ZLIB: True,
+    }[algorithm]
+
+
+class Compressor:
+    """
+    Compresses the values not shorter than `threshold` bytes and prefixes them with the header of the algorithm.
+    `decompress` chooses the algorithm by the header, so the values compressed by any algorithm are readable
+    as long as its package is installed. zstd and lz4 are optional, zlib is used if the chosen one is missing.
+    """
+
+    def __init__(self, algorithm: CompressionAlgorithms, threshold: int, level: int | None = None):
+        if not is_algorithm_available(algorithm):
+            logger.warning("Compression `%s` is not installed, zlib is used instead", algorithm.value)
+            algorithm = CompressionAlgorithms.ZLIB
+
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.level = DEFAULT_LEVELS[algorithm] if level is None else level
+        self._header = COMPRESSION_HEADERS[algorithm]
+
+    def _compress(self, value: bytes) -> bytes:
+        if self.algorithm == CompressionAlgorithms.ZSTD:
+            return zstandard.ZstdCompressor(level=self.level).compress(value)
+        elif self.algorithm == CompressionAlgorithms.LZ4:
+            return lz4_frame.compress(value, compression_level=self.level)
+
+        return zlib.compress(value, self.level)
+
+    def compress(self, value: bytes) -> bytes:
+        if len(value) < self.threshold:
+            return value
+
+        compressed = self._compress(value)
+
+        # incompressible values are kept as is, so reading them costs nothing
+        if len(compressed) + len(self._header) >= len(value):
+            return value
+
+        return self._header + compressed
+
+
+def decompress(value: bytes) -> bytes:
+    """Decompresses the value compressed by `Compressor` with any of the algorithms, returns others as is."""
+    algorithm = ALGORITHMS_BY_HEADER.get(value[:1])
+
+    if algorithm == CompressionAlgorithms.ZSTD:
+        return zstandard.ZstdDecompressor().decompress(value[1:])
+    elif algorithm == CompressionAlgorithms.LZ4:
+        return lz4_frame.decompress(value[1:])
+    elif algorithm == CompressionAlgorithms.ZLIB:
+        return zlib.decompress(value[1:])
+
+    return value
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+from db.storage.cache.base import AbstractAsyncCacheStorage
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationMessage(BaseModel):
+    """Message of the ETL about the documents of the index that were changed."""
+
+    index: str
+    ids: list[str]
+    # ids of the entities the documents refer to by the name of the reference, e.g. the persons of the films
+    references: dict[str, list[str]] = {}
+
+
+class CacheInvalidationListener:
+    """
+    Subscribes to the channel the ETL publishes the changed documents to, and evicts the cached entities
+    of these documents and the values tagged with them. Each worker listens on its own, so its local cache tier
+    is evicted as well.
+    """
+
+    reconnect_delay = 1
+
+    def __init__(self, client: Redis, channel: str, cache: AbstractAsyncCacheStorage):
+        self._client = client
+        self.channel = channel
+        self.cache = cache
+        self._task: asyncio.Task | None = None
+
+    async def invalidate(self, message: InvalidationMessage):
+        """
+        Evicts the cached entities and the cached values tagged with them, the values tagged with the whole index,
+        e.g. the list pages that new documents may get into, the values built from the documents by the entities
+        they refer to, e.g. the filmographies of the persons of the films, and the negative cache entries
+        of the index, e.g. the empty search results, since the documents may match them now.
+        """
+        await self.cache.delete(
+            *(self.cache.get_entity_cache_key(message.index, entity_id) for entity_id in message.ids)
+        )
+        await self.cache.invalidate_tags(
+            self.cache.get_index_tag(message.index),
+            self.cache.get_not_found_tag(message.index),
+            *(self.cache.get_entity_tag(message.index, entity_id) for entity_id in message.ids),
+            *(
+                self.cache.get_reference_tag(message.index, reference, entity_id)
+                for reference, entity_ids in message.references.items()
+                for entity_id in entity_ids
+            ),
+        )
+
+    async def _handle(self, data: bytes | str):
+        try:
+            message = InvalidationMessage.parse_raw(data)
+        except ValidationError as e:
+            logger.warning("Invalid cache invalidation message %r: %s", data, e)
+            return
+
+        await self.invalidate(message)
+
+    async def listen(self):
+        """Handles the messages of the channel until cancelled, resubscribes if the connection is lost."""
+        while True:
+            try:
+                async with self._client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self._handle(message["data"])
+            except ConnectionError as e:
+                logger.warning("Cache invalidation channel `%s` is lost: %s", self.channel, e)
+                await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+
+from core.helpers.utils import model_to_json_bytes
+from db.storage.cache.base import AbstractAsyncCacheStorage, IndexModelType
+
+
+class MemoryCacheEntry(NamedTuple):
+    expires_at: float
+    size: int
+    value: IndexModelType | bytes
+    tags: tuple[str, ...] = ()
+
+
+class MemoryAsyncCacheStorage(AbstractAsyncCacheStorage):
+    """
+    In-process storage of Pydantic models with LRU/TTL eviction.
+
+    The storage is bounded both by the number of records and by the total size of the records in bytes.
+    The size of a record is the length of its json representation. Records are kept as model instances,
+    so a hit does not require parsing.
+    """
+
+    tier_name = "memory"
+
+    def __init__(self, max_items: int, max_bytes: int, key_prefix: str = ""):
+        self._storage: OrderedDict[str, MemoryCacheEntry]
+        super().__init__(OrderedDict(), key_prefix)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._tags: dict[str, set[str]] = {}
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close_storage(self):
+        await self.clear()
+
+    async def clear(self):
+        self._storage.clear()
+        self._tags.clear()
+        self.total_bytes = 0
+
+    def _pop(self, key: str) -> MemoryCacheEntry | None:
+        entry = self._storage.pop(key, None)
+
+        if entry is not None:
+            self.total_bytes -= entry.size
+            self._untag(key, entry.tags)
+
+        return entry
+
+    def _untag(self, key: str, tags: Iterable[str]):
+        for tag in tags:
+            tagged_keys = self._tags.get(tag)
+
+            if tagged_keys is not None:
+                tagged_keys.discard(key)
+
+                if not tagged_keys:
+                    del self._tags[tag]
+
+    def _evict(self):
+        while self._storage and (len(self._storage) > self.max_items or self.total_bytes > self.max_bytes):
+            self._pop(next(iter(self._storage)))
+
+    def _put(self, key: str, value: IndexModelType | bytes, size: int, ttl: int, tags: Iterable[str]):
+        self._pop(key)
+
+        if size > self.max_bytes:
+            return
+
+        tags = tuple(tags)
+        self._storage[key] = MemoryCacheEntry(expires_at=time.monotonic() + ttl, size=size, value=value, tags=tags)
+        self.total_bytes += size
+
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        self._evict()
+
+    def _get(self, key: str) -> IndexModelType | bytes | None:
+        entry = self._storage.get(key)
+
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._pop(key)
+            entry = None
+
+        self.stats.register(hit=entry is not None)
+
+        if entry is None:
+            return None
+
+        self._storage.move_to_end(key)
+        return entry.value
+
+    async def set(self, key: str, value: IndexModelType, ttl: int, tags: Iterable[str] = ()):
+        self._put(key, value, len(model_to_json_bytes(value, by_alias=True)), ttl, tags)
+
+    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | bytes | None:
+        return self._get(key)
+
+    async def set_raw(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()):
+        self._put(key, value, len(value), ttl, tags)
+
+    async def get_raw(self, key: str) -> bytes | None:
+        return self._get(key)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._pop(key)
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._pop(key)
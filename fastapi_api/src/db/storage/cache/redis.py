@@ -1,17 +1,43 @@
-import orjson
-from pydantic import parse_raw_as
+from typing import Awaitable, Callable, Iterable
+
 from redis.asyncio import Redis, ConnectionError
+from redis.asyncio.client import Pipeline
+from redis.exceptions import LockError
 
-from core.helpers.utils import orjson_dumps
-from db.storage.cache.base import AbstractAsyncCacheStorage, IndexModelType
+from db.storage.cache.base import AbstractAsyncCacheStorage, IndexModelType, NOT_FOUND_SENTINEL
+from db.storage.cache.codecs import CacheCodec, DEFAULT_CODEC, decode
+from db.storage.cache.compression import Compressor, decompress
 
 
 class RedisAsyncCacheStorage(AbstractAsyncCacheStorage):
-    """Redis is a repository class of Pydantic models that uses or json for serialization/deserialization."""
+    """
+    Redis is a repository class of Pydantic models that uses the `codec` for serialization/deserialization,
+    json by default. Values written by any codec are readable.
+
+    If `lock_timeout` is set, loading of a missing value is serialized across workers with a Redis lock,
+    so only one worker calls the wrapped function while the others wait and read its result from the cache.
+
+    If `compressor` is set, large values are stored compressed. Compressed values are always readable,
+    so compression can be turned on and off without flushing the cache.
+    """
+
+    tier_name = "redis"
 
-    def __init__(self, client: Redis):
+    def __init__(
+        self,
+        client: Redis,
+        key_prefix: str = "",
+        lock_timeout: float | None = None,
+        lock_blocking_timeout: float | None = None,
+        compressor: Compressor | None = None,
+        codec: CacheCodec = DEFAULT_CODEC,
+    ):
         self._storage: Redis
-        super().__init__(client)
+        super().__init__(client, key_prefix)
+        self.lock_timeout = lock_timeout
+        self.lock_blocking_timeout = lock_blocking_timeout
+        self.compressor = compressor
+        self.codec = codec
 
     async def ping(self) -> bool:
         result = True
@@ -23,13 +49,115 @@ class RedisAsyncCacheStorage(AbstractAsyncCacheStorage):
 
         return result
 
-    async def set(self, key: str, value: IndexModelType, ttl: int):
-        await self._storage.set(key, value.json(encoder=orjson_dumps, by_alias=True), ex=ttl)
+    def _tag(self, pipe: Pipeline, key: str, ttl: int, tags: Iterable[str]):
+        """Adds the key to the sets of the tags, a set lives as long as the longest-lived of its keys."""
+        for tag in tags:
+            tag_key = self.get_tag_key(tag)
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
+
+    def _encode(self, value: IndexModelType | bytes) -> bytes:
+        if not isinstance(value, bytes):
+            value = self.codec.encode(value)
+
+        return self.compressor.compress(value) if self.compressor else value
+
+    def _decode(self, value: bytes | None) -> bytes | None:
+        self.stats.register(hit=value is not None)
+        return value and decompress(value)
+
+    def _parse(self, value: bytes | None, model_type: type[IndexModelType]) -> IndexModelType | bytes | None:
+        value = self._decode(value)
+
+        if value is None or self.is_not_found(value):
+            return value
+
+        return decode(value, model_type)
+
+    async def set(self, key: str, value: IndexModelType, ttl: int, tags: Iterable[str] = ()):
+        await self.set_raw(key, value, ttl, tags)
+
+    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | bytes | None:
+        return self._parse(await self._storage.get(key), model_type)
+
+    async def set_many(self, values: dict[str, IndexModelType], ttl: int, tags: Iterable[str] = ()):
+        async with self._storage.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, self._encode(value), ex=ttl)
+                self._tag(pipe, key, ttl, tags)
+            await pipe.execute()
+
+    async def get_many(self, keys: list[str], model_type: type[IndexModelType]) -> list[IndexModelType | bytes | None]:
+        return [self._parse(value, model_type) for value in await self._storage.mget(keys)]
+
+    async def set_many_not_found(self, keys: list[str], ttl: int):
+        async with self._storage.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, NOT_FOUND_SENTINEL, ex=ttl)
+            await pipe.execute()
 
-    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | None:
-        value = await self._storage.get(key)
+    async def set_raw(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()):
+        value = self._encode(value)
 
-        if value is None:
-            return None
+        if not tags:
+            await self._storage.set(key, value, ex=ttl)
+            return
 
-        return parse_raw_as(model_type, value, json_loads=orjson.loads)
+        async with self._storage.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=ttl)
+            self._tag(pipe, key, ttl, tags)
+            await pipe.execute()
+
+    async def get_raw(self, key: str) -> bytes | None:
+        return self._decode(await self._storage.get(key))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._storage.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str):
+        tag_keys = [self.get_tag_key(tag) for tag in tags]
+
+        if not tag_keys:
+            return
+
+        async with self._storage.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            tagged_keys = set().union(*await pipe.execute())
+
+        await self._storage.delete(*tagged_keys, *tag_keys)
+
+    async def _load_exclusively(
+        self, key: str, model_type: type[IndexModelType], loader: Callable[[], Awaitable[IndexModelType | None]]
+    ) -> IndexModelType | None:
+        if self.lock_timeout is None:
+            return await loader()
+
+        lock = self._storage.lock(f"{key}:lock", timeout=self.lock_timeout, blocking_timeout=self.lock_blocking_timeout)
+
+        if await lock.acquire(blocking=False):
+            try:
+                return await loader()
+            finally:
+                await self._release_lock(lock)
+
+        if not await lock.acquire():
+            # the lock holder is too slow, do not wait for it anymore
+            return await loader()
+
+        try:
+            # the value was probably saved by the previous lock holder
+            value = await self.get(key, model_type)
+            return value if value is not None else await loader()
+        finally:
+            await self._release_lock(lock)
+
+    @staticmethod
+    async def _release_lock(lock):
+        try:
+            await lock.release()
+        except LockError:
+            # the lock has already expired
+            pass
@@ -0,0 +1,113 @@
+from typing import Awaitable, Callable, Iterable
+
+from db.storage.cache.base import AbstractAsyncCacheStorage, CacheStats, IndexModelType
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+
+
+class TieredAsyncCacheStorage(AbstractAsyncCacheStorage):
+    """
+    Two-level cache: a per-worker in-memory storage in front of a shared storage.
+
+    Records found in the shared storage are copied to the local storage. The local copy lives no longer than
+    `local_ttl` seconds, so workers do not serve outdated data for a long time. The tags of the shared records
+    are not known, so the copies are not tagged: `invalidate_tags` evicts only the values the worker has set itself,
+    the copies are bounded by `local_ttl` alone.
+    """
+
+    def __init__(self, local: MemoryAsyncCacheStorage, remote: AbstractAsyncCacheStorage, local_ttl: int):
+        self._storage: AbstractAsyncCacheStorage
+        super().__init__(remote, remote.key_prefix)
+        self.local = local
+        self.local_ttl = local_ttl
+
+    async def ping(self) -> bool:
+        return await self._storage.ping()
+
+    async def close_storage(self):
+        await self.local.close_storage()
+        await self._storage.close_storage()
+
+    def get_stats(self) -> dict[str, CacheStats]:
+        return {**self.local.get_stats(), **self._storage.get_stats()}
+
+    async def set(self, key: str, value: IndexModelType, ttl: int, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        await self._storage.set(key, value, ttl, tags)
+        await self.local.set(key, value, min(ttl, self.local_ttl), tags)
+
+    async def _copy_to_local(self, values: dict[str, IndexModelType | bytes]):
+        found = {}
+
+        for key, value in values.items():
+            if self.is_not_found(value):
+                await self.local.set_raw(key, value, self.local_ttl)
+            else:
+                found[key] = value
+
+        if found:
+            await self.local.set_many(found, self.local_ttl)
+
+    async def get(self, key: str, model_type: type[IndexModelType]) -> IndexModelType | bytes | None:
+        result = await self.local.get(key, model_type)
+
+        if result is not None:
+            return result
+
+        result = await self._storage.get(key, model_type)
+
+        if result is not None:
+            await self._copy_to_local({key: result})
+
+        return result
+
+    async def set_many(self, values: dict[str, IndexModelType], ttl: int, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        await self._storage.set_many(values, ttl, tags)
+        await self.local.set_many(values, min(ttl, self.local_ttl), tags)
+
+    async def get_many(self, keys: list[str], model_type: type[IndexModelType]) -> list[IndexModelType | bytes | None]:
+        result = await self.local.get_many(keys, model_type)
+        missing_keys = [key for key, value in zip(keys, result, strict=True) if value is None]
+
+        if not missing_keys:
+            return result
+
+        remote_values = dict(zip(missing_keys, await self._storage.get_many(missing_keys, model_type), strict=True))
+        await self._copy_to_local({key: value for key, value in remote_values.items() if value is not None})
+
+        return [value if value is not None else remote_values[key] for key, value in zip(keys, result, strict=True)]
+
+    async def set_raw(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        await self._storage.set_raw(key, value, ttl, tags)
+        await self.local.set_raw(key, value, min(ttl, self.local_ttl), tags)
+
+    async def get_raw(self, key: str) -> bytes | None:
+        result = await self.local.get_raw(key)
+
+        if result is not None:
+            return result
+
+        result = await self._storage.get_raw(key)
+
+        if result is not None:
+            await self.local.set_raw(key, result, self.local_ttl)
+
+        return result
+
+    async def set_many_not_found(self, keys: list[str], ttl: int):
+        await self._storage.set_many_not_found(keys, ttl)
+        await self.local.set_many_not_found(keys, min(ttl, self.local_ttl))
+
+    async def delete(self, *keys: str):
+        await self.local.delete(*keys)
+        await self._storage.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str):
+        await self.local.invalidate_tags(*tags)
+        await self._storage.invalidate_tags(*tags)
+
+    async def _load_exclusively(
+        self, key: str, model_type: type[IndexModelType], loader: Callable[[], Awaitable[IndexModelType | None]]
+    ) -> IndexModelType | None:
+        return await self._storage._load_exclusively(key, model_type, loader)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import random
+import uuid
+from urllib.parse import urlencode
+
+from fastapi import Request
+from redis.asyncio import Redis
+from starlette.types import ASGIApp, Message
+
+logger = logging.getLogger(__name__)
+
+# header of the replayed requests, they are not recorded again
+WARMUP_HEADER = "x-cache-warmup"
+# query parameters of the requests that are not cached and are not worth replaying
+NOT_REPLAYED_PARAMS = {"page[cursor]"}
+
+
+class PopularRequests:
+    """
+    Top of the GET requests of the API kept in a Redis sorted set: the member is the request signature
+    (the path and the query parameters sorted by name), the score is the number of sampled requests.
+
+    The set grows up to twice `max_size` signatures and is then trimmed to the `max_size` most popular ones.
+    Trimming on every request would evict the newly added signature at once: with the score of one request it is
+    always the least popular one in a full set, so no new signature could ever get into the top.
+    """
+
+    def __init__(self, client: Redis, key: str, sample_rate: float, max_size: int):
+        self._client = client
+        self.key = key
+        self.sample_rate = sample_rate
+        self.max_size = max_size
+
+    @staticmethod
+    def get_signature(request: Request) -> str:
+        query_params = sorted(request.query_params.multi_items())
+        return f"{request.url.path}?{urlencode(query_params)}" if query_params else request.url.path
+
+    async def record(self, request: Request):
+        if request.method != "GET" or WARMUP_HEADER in request.headers:
+            return
+
+        if NOT_REPLAYED_PARAMS.intersection(request.query_params) or random.random() >= self.sample_rate:
+            return
+
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.zincrby(self.key, 1, self.get_signature(request))
+            pipe.zcard(self.key)
+            _, size = await pipe.execute()
+
+        if size > 2 * self.max_size:
+            await self._client.zremrangebyrank(self.key, 0, -self.max_size - 1)
+
+    async def top(self, limit: int) -> list[str]:
+        """Returns the signatures of the most popular requests, the most popular first."""
+        signatures = await self._client.zrevrange(self.key, 0, limit - 1)
+        return [signature.decode() if isinstance(signature, bytes) else signature for signature in signatures]
+
+
+async def replay_request(app: ASGIApp, signature: str, headers: dict[str, str]) -> int:
+    """Passes the GET request with the signature to the application and returns the response status code."""
+    path, _, query_string = signature.partition("?")
+    status_code = 0
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 0),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "headers": [(b"host", b"localhost"), *((name.encode(), value.encode()) for name, value in headers.items())],
+    }
+    await app(scope, receive, send)
+    return status_code
+
+
+async def warm_up_cache(
+    app: ASGIApp,
+    popular_requests: PopularRequests,
+    limit: int,
+    concurrency: int,
+    request_id_header: str,
+    access_token: str | None = None,
+) -> int:
+    """
+    Replays the most popular requests through the application, so their responses get cached.
+
+    :param app: the application;
+    :param popular_requests: top of the requests;
+    :param limit: number of the requests to replay;
+    :param concurrency: number of the requests replayed at the same time;
+    :param request_id_header: header with the request id required by the application;
+    :param access_token: bearer token the requests are replayed with, required when the access is checked;
+    :return: number of the requests replayed successfully.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def replay(signature: str) -> bool:
+        async with semaphore:
+            headers = {WARMUP_HEADER: "1", request_id_header.lower(): str(uuid.uuid4())}
+            if access_token:
+                headers["authorization"] = f"Bearer {access_token}"
+            try:
+                return await replay_request(app, signature, headers) == 200
+            except Exception as e:
+                logger.warning("Warmup request %s failed: %s", signature, e)
+                return False
+
+    signatures = await popular_requests.top(limit)
+    replayed = sum(await asyncio.gather(*(replay(signature) for signature in signatures)))
+    logger.info("Cache warmed up with %s of %s popular requests", replayed, len(signatures))
+    return replayed
+
+
+async def warm_up_cache_periodically(
+    app: ASGIApp,
+    popular_requests: PopularRequests,
+    limit: int,
+    concurrency: int,
+    request_id_header: str,
+    interval: float,
+    access_token: str | None = None,
+):
+    """Warms up the cache every `interval` seconds until cancelled."""
+    while True:
+        await warm_up_cache(app, popular_requests, limit, concurrency, request_id_header, access_token)
+        await asyncio.sleep(interval)
@@ -3,8 +3,57 @@ from functools import lru_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Request
 
+from core.config import get_settings
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
+
+
+def create_elastic_client() -> AsyncElasticsearch:
+    """Creates the Elasticsearch client with the connection pool, compression and sniffing from the settings."""
+    settings = get_settings()
+    client_settings = settings.elastic_client
+    sniffing = {
+        "sniff_on_start": client_settings.sniff_on_start,
+        "sniff_on_node_failure": client_settings.sniff_on_node_failure,
+        "sniff_before_requests": client_settings.sniff_before_requests,
+    }
+
+    if client_settings.sniff_before_requests:
+        # the client enables sniffing before requests whenever the delay is passed, so it is only passed along with it
+        sniffing["min_delay_between_sniffing"] = client_settings.min_delay_between_sniffing
+
+    return AsyncElasticsearch(
+        hosts=[settings.elasticsearch_dsn],
+        connections_per_node=client_settings.connections_per_node,
+        http_compress=client_settings.http_compress,
+        request_timeout=client_settings.request_timeout,
+        max_retries=client_settings.max_retries,
+        retry_on_timeout=client_settings.retry_on_timeout,
+        **sniffing,
+    )
+
+
+def create_elastic_batcher(client: AsyncElasticsearch) -> ElasticMultiSearchBatcher | None:
+    """Creates the batcher of concurrent searches if batching is enabled in the settings."""
+    settings = get_settings()
+    batching = settings.elastic_batching
+
+    if not batching.enabled:
+        return None
+
+    return ElasticMultiSearchBatcher(
+        client.options(request_timeout=settings.elastic_client.timeouts.search),
+        max_batch_size=batching.max_batch_size,
+        max_wait=batching.max_wait,
+    )
+
 
 @lru_cache
 def get_elastic(request: Request) -> AsyncElasticsearch:
     """Get Elasticsearch connection."""
     return request.app.state.es
+
+
+@lru_cache
+def get_elastic_batcher(request: Request) -> ElasticMultiSearchBatcher | None:
+    """Get the batcher of concurrent searches, None if batching is disabled."""
+    return getattr(request.app.state, "es_batcher", None)
@@ -1,40 +1,72 @@
 from functools import lru_cache
+from typing import AsyncIterator
 
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import AsyncElasticsearch, BadRequestError, NotFoundError
 from fastapi import Depends
+from pydantic import BaseModel
 
+from core.config import get_settings
 from core.tracer import instrumented
 from db.storage.base import (
+    AggregationBucket,
+    AggregationEntity,
+    AggregationTypes,
     BaseStorage,
     ComparisonOperators,
+    CountModes,
+    CountRelations,
+    Cursor,
     EntitiesAndCountModel,
+    EntitiesAndCursorModel,
     FilterEntity,
     FilterGroup,
+    InvalidCursorError,
     LogicalGroupOperators,
     IndexModelType,
     QueryBuilder,
+    QueryStructure,
     SearchString,
     SearchTypes,
+    SortEntity,
+    get_source_fields,
+    render_template,
 )
-from db.storage.elasticsearch import get_elastic
+from db.storage.elasticsearch import get_elastic, get_elastic_batcher
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
+
+COMPILED_QUERIES_CACHE_SIZE = 1024
 
 
 class BaseElasticStorage(BaseStorage[IndexModelType]):
     index_name: str
     model_type: type[IndexModelType]
     result_fields: list[str] | None
+    # unique field that makes the sorting total, so `search_after` never skips or repeats documents
+    tiebreaker_field: str = "id"
+    # kept short: the point in time of a cursor walk abandoned before the last page stays open until it expires
+    point_in_time_keep_alive: str = "1m"
 
-    def __init__(self, client: AsyncElasticsearch):
+    def __init__(self, client: AsyncElasticsearch, batcher: ElasticMultiSearchBatcher | None = None):
         self._storage: AsyncElasticsearch
         super().__init__(client)
+        self._batcher = batcher
+        self._clients: dict[str, AsyncElasticsearch] = {}
 
     async def ping(self) -> bool:
         return self._storage and await self._storage.ping()
 
+    def _client(self, operation: str) -> AsyncElasticsearch:
+        """Returns the client with the request timeout for the type of operation: `get`, `search` or `point_in_time`."""
+        if operation not in self._clients:
+            timeout = getattr(get_settings().elastic_client.timeouts, operation)
+            self._clients[operation] = self._storage.options(request_timeout=timeout)
+
+        return self._clients[operation]
+
     async def _get_entity(self, key: str) -> any:
         """Returns the raw-data from ElasticSearch by document `id`."""
         try:
-            doc = await self._storage.get(index=self.index_name, id=key)
+            doc = await self._client("get").get(index=self.index_name, id=key)
         except NotFoundError:
             return None
 
@@ -49,6 +81,14 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
 
         return self.model_type(**doc["_source"])
 
+    async def get_entities(self, keys: list[str]) -> list[IndexModelType | None]:
+        """Returns the Pydantic models from ElasticSearch by documents `ids` with a single `_mget` request."""
+        if not keys:
+            return []
+
+        docs = await self._client("get").mget(index=self.index_name, ids=keys, source=self.result_fields)
+        return [self.model_type(**doc["_source"]) if doc.get("found") else None for doc in docs["docs"]]
+
     @staticmethod
     def get_elastic_filter_by_filter_entity(filter_entity: FilterEntity) -> dict[str, any]:
         """
@@ -96,6 +136,7 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
     def get_elastic_filter(cls, filter_: FilterEntity | FilterGroup | None) -> dict[str, any] | None:
         """
         Method that calls get_elastic_filter_by_filter_entity for FilterEntity and performs grouping for FilterGroup.
+        The groups are built for the filter context: they do not affect the score and ElasticSearch caches them.
         """
 
         if filter_ is None:
@@ -104,17 +145,12 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
         if isinstance(filter_, FilterEntity):
             return cls.get_elastic_filter_by_filter_entity(filter_)
 
-        group_word = "must"
-        if filter_.logical_group_operator == LogicalGroupOperators.OR:
-            group_word = "should"
-
-        filters = []
-        filter_query = {"bool": {group_word: filters}}
+        filters = [cls.get_elastic_filter(filter_entity) for filter_entity in filter_.entities]
 
-        for filter_entity in filter_.entities:
-            filters.append(cls.get_elastic_filter(filter_entity))
+        if filter_.logical_group_operator == LogicalGroupOperators.OR:
+            return {"bool": {"should": filters, "minimum_should_match": 1}}
 
-        return filter_query
+        return {"bool": {"filter": filters}}
 
     @staticmethod
     def get_elastic_query_by_search_string(search_string: SearchString | None) -> dict[str, any] | None:
@@ -123,10 +159,24 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
         if search_string is None:
             return None
 
+        if search_string.type_search == SearchTypes.PREFIX:
+            # search fields are `search_as_you_type` fields, their shingle subfields make multi-word prefixes cheap
+            return {
+                "multi_match": {
+                    "query": search_string.search_string,
+                    "type": "bool_prefix",
+                    "fields": [
+                        subfield
+                        for field in search_string.search_fields
+                        for subfield in (field, f"{field}._2gram", f"{field}._3gram")
+                    ],
+                }
+            }
+
         elastic_query = {
             "multi_match": {
                 "query": search_string.search_string,
-                "fields": search_string.search_fields,
+                "fields": list(search_string.search_fields),
             }
         }
 
@@ -135,48 +185,362 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
 
         return elastic_query
 
-    async def _fetch(self, query: QueryBuilder | None, batch_size: int) -> dict[str, any]:
+    @classmethod
+    def get_elastic_query(cls, query: QueryBuilder) -> dict[str, any] | None:
+        """Returns the ElasticSearch query for the query builder, compiled once per query structure."""
+        structure, params = query.parametrize()
+        return render_template(cls.compile_elastic_query(structure), params)
+
+    @classmethod
+    @lru_cache(maxsize=COMPILED_QUERIES_CACHE_SIZE)
+    def compile_elastic_query(cls, structure: QueryStructure) -> dict[str, any] | None:
+        """
+        Combines the filter and the search string of the query structure into the ElasticSearch query template.
+        The search string is scored in `bool.must`, the filter is applied in `bool.filter`.
+        The template is shared between requests and must not be modified, use `render_template` to fill the slots.
+        """
+        filter_query = cls.get_elastic_filter(structure.filter_)
+        search_query = cls.get_elastic_query_by_search_string(structure.search_query_)
+
+        if filter_query is None:
+            return search_query
+
+        bool_query = {"filter": cls.get_filter_clauses(filter_query)}
+        if search_query is not None:
+            bool_query = {"must": [search_query], **bool_query}
+
+        return {"bool": bool_query}
+
+    @staticmethod
+    def get_filter_clauses(filter_query: dict[str, any]) -> list[dict[str, any]]:
+        """Unwraps the top-level AND group, so its clauses go directly to `bool.filter` of the query."""
+        if list(filter_query) == ["bool"] and list(filter_query["bool"]) == ["filter"]:
+            return filter_query["bool"]["filter"]
+
+        return [filter_query]
+
+    @staticmethod
+    def get_nested_path(field_name: str) -> str | None:
+        """Returns the path of the nested object of the field, the fields with a dot are nested as in the filters."""
+        return field_name.rpartition(".")[0] or None
+
+    @classmethod
+    def get_elastic_aggregation(cls, aggregation: AggregationEntity) -> dict[str, any]:
+        """
+        Returns the ElasticSearch aggregation for the aggregation entity. The label of a bucket is taken
+        from the first document of the bucket with `top_hits`, so it costs no additional request.
+        """
+        if aggregation.aggregation_type == AggregationTypes.YEAR_HISTOGRAM:
+            elastic_aggregation = {
+                "date_histogram": {
+                    "field": aggregation.field_name,
+                    "calendar_interval": "year",
+                    "format": "yyyy",
+                    "min_doc_count": 1,
+                }
+            }
+        else:
+            elastic_aggregation = {"terms": {"field": aggregation.field_name, "size": aggregation.size}}
+
+        if aggregation.label_field is not None:
+            elastic_aggregation["aggs"] = {
+                "label": {"top_hits": {"size": 1, "_source": {"includes": [aggregation.label_field]}}}
+            }
+
+        nested_path = cls.get_nested_path(aggregation.field_name)
+
+        if nested_path is None:
+            return elastic_aggregation
+
+        return {"nested": {"path": nested_path}, "aggs": {aggregation.name: elastic_aggregation}}
+
+    @classmethod
+    @lru_cache(maxsize=COMPILED_QUERIES_CACHE_SIZE)
+    def get_elastic_aggregations(cls, aggregations: tuple[AggregationEntity, ...]) -> dict[str, any] | None:
+        """
+        Returns the `aggs` of the search request, compiled once per set of aggregations.
+        The result is shared between requests and must not be modified.
+        """
+        if not aggregations:
+            return None
+
+        return {aggregation.name: cls.get_elastic_aggregation(aggregation) for aggregation in aggregations}
+
+    @classmethod
+    def get_aggregation_buckets(
+        cls, aggregations: tuple[AggregationEntity, ...], docs: dict[str, any]
+    ) -> dict[str, list[AggregationBucket]]:
+        """Returns the buckets of the aggregations from the search response by the names of the aggregations."""
+        results = docs.get("aggregations", {})
+        buckets = {}
+
+        for aggregation in aggregations:
+            result = results.get(aggregation.name, {})
+
+            if cls.get_nested_path(aggregation.field_name) is not None:
+                result = result.get(aggregation.name, {})
+
+            buckets[aggregation.name] = [
+                AggregationBucket(
+                    key=bucket.get("key_as_string", bucket["key"]),
+                    count=bucket["doc_count"],
+                    label=cls.get_bucket_label(aggregation, bucket),
+                )
+                for bucket in result.get("buckets", [])
+            ]
+
+        return buckets
+
+    @staticmethod
+    def get_bucket_label(aggregation: AggregationEntity, bucket: dict[str, any]) -> str | None:
+        if aggregation.label_field is None:
+            return None
+
+        hits = bucket.get("label", {}).get("hits", {}).get("hits", [])
+
+        if not hits:
+            return None
+
+        # the source of a nested document contains the fields of the nested object only
+        return hits[0]["_source"].get(aggregation.label_field.rpartition(".")[2])
+
+    @staticmethod
+    def get_filter_path(query: QueryBuilder | None, *filter_path: str) -> list[str]:
+        """Adds the aggregations to the filter path of the response if the query requests them."""
+        if query is not None and query.aggregations_:
+            return [*filter_path, "aggregations"]
+
+        return list(filter_path)
+
+    def get_source_includes(self, query: QueryBuilder | None) -> list[str] | None:
+        if query is not None and query.projection_ is not None:
+            return get_source_fields(query.projection_)
+
+        return self.result_fields
+
+    def get_result_model(self, query: QueryBuilder | None) -> type[BaseModel]:
+        if query is not None and query.projection_ is not None:
+            return query.projection_
+
+        return self.model_type
+
+    @staticmethod
+    def get_track_total_hits(query: QueryBuilder | None) -> bool | int:
+        """Converts the count mode of the query builder to the `track_total_hits` search parameter."""
         if query is None:
-            return await self._storage.search(index=self.index_name, filter_path=["hits.total", "hits.hits._source"])
+            return QueryBuilder.count_limit_
+
+        if query.count_mode_ == CountModes.EXACT:
+            return True
+
+        if query.count_mode_ == CountModes.NONE:
+            return False
+
+        return query.count_limit_
+
+    @staticmethod
+    def get_hits(docs: dict[str, any]) -> list[dict[str, any]]:
+        """
+        Returns the hits of the search response. With `filter_path` ElasticSearch drops the empty `hits`,
+        e.g. of a search without matches that doesn't count them, so a missing key means no hits.
+        """
+        return docs.get("hits", {}).get("hits", [])
 
-        filter_query = self.get_elastic_filter(query.filter_)
-        search_query = self.get_elastic_query_by_search_string(query.search_query_)
+    @staticmethod
+    def get_hits_count(docs: dict[str, any]) -> dict[str, any]:
+        """Returns the total number of hits and its relation, the count is None if the hits were not counted."""
+        total = docs.get("hits", {}).get("total")
+
+        if total is None:
+            return {"count": None, "count_relation": CountRelations.EQ}
+
+        return {"count": total["value"], "count_relation": CountRelations(total["relation"])}
+
+    async def _search(self, **params) -> dict[str, any]:
+        """Searches the index, in a batch with concurrent searches if the storage has a batcher."""
+        if self._batcher is None:
+            return await self._client("search").search(index=self.index_name, **params)
 
-        elastic_query = filter_query
-        if filter_query and search_query:
-            elastic_query = {"bool": {"must": [search_query and filter_query]}}
-        elif search_query:
-            elastic_query = search_query
+        return await self._batcher.search(index=self.index_name, **params)
 
-        return await self._storage.search(
-            index=self.index_name,
-            query=elastic_query,
+    async def _fetch(
+        self, query: QueryBuilder | None, batch_size: int, track_total_hits: bool | int, aggregate: bool = False
+    ) -> dict[str, any]:
+        if query is None:
+            return await self._search(
+                filter_path=["hits.total", "hits.hits._source"],
+                source=self.result_fields,
+                track_total_hits=track_total_hits,
+            )
+
+        return await self._search(
+            query=self.get_elastic_query(query),
             from_=query.offset_,
             size=batch_size,
-            sort=[{sort.field_name: sort.order} for sort in query.sorts_] if query.sorts_ else None,
-            filter_path=["hits.total", "hits.hits._source"],
-            source=self.result_fields,
+            sort=self.get_elastic_sort(query.sorts_),
+            filter_path=self.get_filter_path(query if aggregate else None, "hits.total", "hits.hits._source"),
+            source=self.get_source_includes(query),
+            track_total_hits=track_total_hits,
+            aggs=self.get_elastic_aggregations(query.aggregations_) if aggregate else None,
+        )
+
+    @staticmethod
+    def get_elastic_sort(sorts: list[SortEntity] | None) -> list[dict[str, str]] | None:
+        if not sorts:
+            return None
+
+        return [{sort.field_name: sort.order} for sort in sorts]
+
+    async def _search_after(self, query: QueryBuilder, batch_size: int, cursor: Cursor) -> dict[str, any]:
+        """Returns the page after the cursor, within the point in time if the cursor has one."""
+        search_params = {
+            "query": self.get_elastic_query(query),
+            "size": batch_size,
+            "sort": [*(self.get_elastic_sort(query.sorts_) or []), {self.tiebreaker_field: "asc"}],
+            "search_after": cursor.search_after or None,
+            "filter_path": self.get_filter_path(query, "pit_id", "hits.total", "hits.hits._source", "hits.hits.sort"),
+            "source": self.get_source_includes(query),
+            "track_total_hits": self.get_track_total_hits(query),
+            "aggs": self.get_elastic_aggregations(query.aggregations_),
+        }
+
+        if cursor.point_in_time is None:
+            return await self._client("search").search(index=self.index_name, **search_params)
+
+        return await self._client("search").search(
+            pit={"id": cursor.point_in_time, "keep_alive": self.point_in_time_keep_alive}, **search_params
         )
 
+    def get_cursor_scope(self, query: QueryBuilder) -> str:
+        """Returns the index and the sorting of the query, the cursors of its pages are bound to them."""
+        return ",".join([self.index_name, *(f"{sort.field_name}:{sort.order.value}" for sort in query.sorts_ or ())])
+
+    def check_cursor(self, query: QueryBuilder, cursor: Cursor):
+        """
+        Raises InvalidCursorError if the cursor was not made for the pages of the query, e.g. by another endpoint,
+        or its `search_after` is not the sort values, the tiebreaker and the `_shard_doc` of the point in time.
+        """
+        sorts_count = len(query.sorts_ or ())
+        search_after = cursor.search_after
+
+        if (
+            cursor.scope != self.get_cursor_scope(query)
+            or len(search_after) != sorts_count + 1 + (cursor.point_in_time is not None)
+            or not all(value is None or isinstance(value, (str, int, float)) for value in search_after[:sorts_count])
+            or not isinstance(search_after[sorts_count], str)
+            or (cursor.point_in_time is not None and not isinstance(search_after[-1], int))
+        ):
+            raise InvalidCursorError("The cursor doesn't continue the pages of the query")
+
+    async def _search_next(self, query: QueryBuilder, batch_size: int) -> tuple[dict[str, any], str | None]:
+        """
+        Returns the response with the page after `query.cursor_` and the point in time the page was read in.
+        A point in time is opened for the first page, the page is read without it if it has expired.
+        """
+        cursor = query.cursor_
+
+        if cursor is None:
+            point_in_time = await self._client("point_in_time").open_point_in_time(
+                index=self.index_name, keep_alive=self.point_in_time_keep_alive
+            )
+            cursor = Cursor(point_in_time=point_in_time["id"], search_after=[])
+
+        try:
+            docs = await self._search_after(query, batch_size, cursor)
+        except NotFoundError:
+            if cursor.point_in_time is None:
+                raise
+            # the point in time has expired: continue without it, dropping the implicit `_shard_doc` tiebreaker
+            cursor = Cursor(point_in_time=None, search_after=cursor.search_after[:-1])
+            docs = await self._search_after(query, batch_size, cursor)
+
+        return docs, docs.get("pit_id", cursor.point_in_time)
+
+    @instrumented
+    async def fetch_next(self, query: QueryBuilder, batch_size: int = 50) -> EntitiesAndCursorModel[IndexModelType]:
+        if query.cursor_ is not None:
+            self.check_cursor(query, query.cursor_)
+
+        try:
+            # one more document is requested to know whether the page is the last one
+            docs, point_in_time = await self._search_next(query, batch_size + 1)
+        except BadRequestError as e:
+            if query.cursor_ is None:
+                raise
+            # the shape of the cursor is checked, but its values, e.g. the point in time, may still be tampered with
+            raise InvalidCursorError("The cursor is rejected by ElasticSearch") from e
+
+        documents = self.get_hits(docs)
+        next_cursor = None
+
+        if len(documents) > batch_size:
+            documents = documents[:batch_size]
+            next_cursor = Cursor(
+                point_in_time=point_in_time, search_after=documents[-1]["sort"], scope=self.get_cursor_scope(query)
+            )
+        elif point_in_time is not None:
+            # the walk is over, the point in time is not kept until it expires
+            await self._client("point_in_time").close_point_in_time(id=point_in_time)
+
+        return EntitiesAndCursorModel[IndexModelType](
+            **self.get_hits_count(docs),
+            entities=[self.get_result_model(query)(**value["_source"]) for value in documents],
+            next_cursor=next_cursor,
+            aggregations=self.get_aggregation_buckets(query.aggregations_, docs),
+        )
+
+    async def scan(self, query: QueryBuilder, batch_size: int = 500) -> AsyncIterator[tuple[IndexModelType, Cursor]]:
+        """
+        Iterates over all the entities after `query.cursor_` in a point in time, a page of `batch_size` entities
+        at a time. The next page is requested only when the previous one is consumed, so the memory is bounded
+        by a page whatever the size of the index.
+
+        Each entity is yielded with the cursor that resumes after it. The cursor doesn't keep the point in time,
+        which is closed when the iteration ends, the total sorting by `tiebreaker_field` is enough to resume.
+        """
+        query = query.count(CountModes.NONE)
+        point_in_time = None
+
+        try:
+            while True:
+                docs, point_in_time = await self._search_next(query, batch_size)
+                documents = self.get_hits(docs)
+                result_model = self.get_result_model(query)
+
+                for document in documents:
+                    # the implicit `_shard_doc` tiebreaker of the point in time is dropped from the sort values
+                    search_after = document["sort"][:-1] if point_in_time is not None else document["sort"]
+                    yield result_model(**document["_source"]), Cursor(point_in_time=None, search_after=search_after)
+
+                # the last page, or no page at all when the previous one ended the index or the cursor is past it
+                if len(documents) < batch_size:
+                    break
+
+                query = query.after(Cursor(point_in_time=point_in_time, search_after=documents[-1]["sort"]))
+        finally:
+            if point_in_time is not None:
+                await self._client("point_in_time").close_point_in_time(id=point_in_time)
+
     @instrumented
     async def fetch(self, query: QueryBuilder | None = None, batch_size: int = 50) -> list[IndexModelType] | None:
-        docs = await self._fetch(query, batch_size)
+        docs = await self._fetch(query, batch_size, track_total_hits=False)
 
-        if documents := docs["hits"].get("hits", None):
-            return [self.model_type(**value["_source"]) for value in documents]
+        if documents := self.get_hits(docs):
+            return [self.get_result_model(query)(**value["_source"]) for value in documents]
 
     @instrumented
     async def fetch_count(
         self, query: QueryBuilder | None = None, batch_size: int = 50
     ) -> EntitiesAndCountModel[IndexModelType] | None:
-        docs = await self._fetch(query, batch_size)
+        docs = await self._fetch(query, batch_size, track_total_hits=self.get_track_total_hits(query), aggregate=True)
 
-        if not docs["hits"].get("hits"):
+        if not (documents := self.get_hits(docs)):
             return None
 
         return EntitiesAndCountModel[IndexModelType](
-            count=docs["hits"]["total"]["value"],
-            entities=[self.model_type(**value["_source"]) for value in docs["hits"]["hits"]],
+            **self.get_hits_count(docs),
+            entities=[self.get_result_model(query)(**value["_source"]) for value in documents],
+            aggregations=self.get_aggregation_buckets(query.aggregations_, docs) if query is not None else {},
         )
 
     def query(self) -> QueryBuilder:
@@ -184,6 +548,9 @@ class BaseElasticStorage(BaseStorage[IndexModelType]):
 
 
 @lru_cache
-def get_base_elastic_storage(client: AsyncElasticsearch = Depends(get_elastic)) -> BaseElasticStorage:
+def get_base_elastic_storage(
+    client: AsyncElasticsearch = Depends(get_elastic),
+    batcher: ElasticMultiSearchBatcher | None = Depends(get_elastic_batcher),
+) -> BaseElasticStorage:
     """For servives that don't need data from index"""
-    return BaseElasticStorage(client)
+    return BaseElasticStorage(client, batcher)
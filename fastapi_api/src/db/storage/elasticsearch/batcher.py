@@ -0,0 +1,145 @@
+import asyncio
+import dataclasses
+import logging
+from itertools import groupby
+from typing import NamedTuple
+
+from elastic_transport import ApiResponseMeta
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import HTTP_EXCEPTIONS, ApiError
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# names of the `search` method arguments that differ from the names of the request body fields
+SEARCH_BODY_FIELDS = {"from_": "from", "source": "_source"}
+
+
+def get_search_error(status: int, error: dict[str, any], meta: ApiResponseMeta) -> ApiError:
+    """
+    Returns the exception the client would have raised for the failed search from the batch, e.g. `NotFoundError`
+    for a missing index or an expired point in time, so the callers handle it the same way as with the plain search.
+    """
+    error_class = HTTP_EXCEPTIONS.get(status, ApiError)
+    message = error.get("type", "search_failed") if isinstance(error, dict) else str(error)
+    return error_class(message=message, meta=dataclasses.replace(meta, status=status), body={"error": error})
+
+
+class MultiSearchStats(BaseModel):
+    max_batch_size: int
+    batches: int = 0
+    searches: int = 0
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.searches / self.batches if self.batches else 0.0
+
+    @property
+    def fill_rate(self) -> float:
+        """Average share of the batch capacity used by the sent batches."""
+        return self.average_batch_size / self.max_batch_size
+
+    def register(self, batch_size: int):
+        self.batches += 1
+        self.searches += batch_size
+
+
+class PendingSearch(NamedTuple):
+    header: dict[str, any]
+    body: dict[str, any]
+    filter_path: list[str]
+    future: asyncio.Future
+
+
+class ElasticMultiSearchBatcher:
+    """
+    Collects the searches made concurrently within `max_wait` seconds and sends them with a single `_msearch`
+    request per `filter_path`, since the filter applies to the whole multi search response. A batch is sent earlier
+    as soon as it has `max_batch_size` searches. Each caller gets its own response, or the client exception
+    (`NotFoundError`, `BadRequestError`, ...) if its search failed.
+    """
+
+    def __init__(self, client: AsyncElasticsearch, max_batch_size: int, max_wait: float):
+        self._client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = MultiSearchStats(max_batch_size=max_batch_size)
+        self._pending: list[PendingSearch] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def search(self, index: str, filter_path: list[str] | None = None, **params) -> dict[str, any]:
+        """Accepts the same arguments as `AsyncElasticsearch.search` and returns the response of this search."""
+        loop = asyncio.get_running_loop()
+        body = {SEARCH_BODY_FIELDS.get(name, name): value for name, value in params.items() if value is not None}
+        pending = PendingSearch(
+            header={"index": index}, body=body, filter_path=sorted(filter_path or []), future=loop.create_future()
+        )
+        self._pending.append(pending)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await pending.future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: list[PendingSearch]):
+        # searches without a filter get the full response, so they can't share a request with the filtered ones
+        groups = groupby(
+            sorted(batch, key=lambda pending: pending.filter_path), key=lambda pending: pending.filter_path
+        )
+        await asyncio.gather(*(self._send_group(filter_path, list(group)) for filter_path, group in groups))
+
+    async def _send_group(self, filter_path: list[str], group: list[PendingSearch]):
+        self.stats.register(len(group))
+        searches = [part for pending in group for part in (pending.header, pending.body)]
+
+        if filter_path:
+            filter_path = ["responses.status", "responses.error", *(f"responses.{path}" for path in filter_path)]
+
+        try:
+            response = await self._client.msearch(searches=searches, filter_path=filter_path or None)
+        except Exception as e:
+            logger.error("Multi search of %s searches failed: %s", len(group), e)
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        try:
+            for pending, result in zip(group, response["responses"], strict=True):
+                if pending.future.done():
+                    continue
+
+                if "error" in result:
+                    pending.future.set_exception(
+                        get_search_error(result.get("status", 500), result["error"], response.meta)
+                    )
+                else:
+                    pending.future.set_result(result)
+        except ValueError as e:
+            # the number of the responses differs from the number of the searches, the rest are not waited for forever
+            logger.error("Multi search of %s searches got %s responses", len(group), len(response["responses"]))
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+    async def close(self):
+        """Sends the collected searches and waits for the responses to all the sent batches."""
+        self._flush()
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
@@ -1,19 +1,93 @@
 from functools import lru_cache
+from typing import Generic
 
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
-from db.storage.elasticsearch import get_elastic
+from core.tracer import instrumented
+from db.storage.base import EntitiesAndCountModel, IndexModelType, QueryBuilder, get_source_fields
+from db.storage.elasticsearch import get_elastic, get_elastic_batcher
 from db.storage.elasticsearch.base import BaseElasticStorage
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
 from models.film import Film
 
 
+class PersonFilmsModel(EntitiesAndCountModel[IndexModelType], Generic[IndexModelType]):
+    # roles of the person in each of the entities, in the same order
+    roles: list[list[str]]
+
+
 class FilmElasticStorage(BaseElasticStorage[Film]):
     index_name = "movies"
     model_type = Film
-    result_fields = None
+    result_fields = get_source_fields(Film)
+    # nested fields of the film persons by the role of the person
+    person_role_fields = {"actor": "actors", "writer": "writers", "director": "directors"}
+
+    @classmethod
+    def get_person_films_query(cls, person_id: str, query: QueryBuilder) -> dict[str, any]:
+        """
+        Returns the query of the films with the person in any of the roles. Each role is a nested query
+        with named `inner_hits`, so the roles of the person in a film are returned along with it.
+        """
+        person_query = {
+            "bool": {
+                "should": [
+                    {
+                        "nested": {
+                            "path": field,
+                            "query": {"term": {f"{field}.id": person_id}},
+                            "inner_hits": {"name": role, "size": 0},
+                        }
+                    }
+                    for role, field in cls.person_role_fields.items()
+                ],
+                "minimum_should_match": 1,
+            }
+        }
+        elastic_query = cls.get_elastic_query(query)
+
+        if elastic_query is None:
+            return {"bool": {"filter": [person_query]}}
+
+        return {"bool": {"filter": [person_query], "must": [elastic_query]}}
+
+    @instrumented
+    async def fetch_person_films(
+        self, person_id: str, query: QueryBuilder, batch_size: int = 50
+    ) -> PersonFilmsModel[Film]:
+        """Returns a page of the films with the person and the roles of the person in them with a single search."""
+        docs = await self._search(
+            query=self.get_person_films_query(person_id, query),
+            from_=query.offset_,
+            size=batch_size,
+            sort=self.get_elastic_sort(query.sorts_),
+            filter_path=["hits.total", "hits.hits._source", "hits.hits.inner_hits.*.hits.total.value"],
+            source=self.get_source_includes(query),
+            track_total_hits=self.get_track_total_hits(query),
+        )
+        documents = self.get_hits(docs)
+
+        return PersonFilmsModel[Film](
+            **self.get_hits_count(docs),
+            entities=[self.get_result_model(query)(**document["_source"]) for document in documents],
+            roles=[self.get_person_roles(document) for document in documents],
+        )
+
+    @classmethod
+    def get_person_roles(cls, document: dict[str, any]) -> list[str]:
+        """Returns the roles whose `inner_hits` matched the person in the document."""
+        inner_hits = document.get("inner_hits", {})
+        return [
+            role
+            for role in cls.person_role_fields
+            if inner_hits.get(role, {}).get("hits", {}).get("total", {}).get("value")
+        ]
 
 
 @lru_cache
-def get_film_elastic_storage(client: AsyncElasticsearch = Depends(get_elastic)) -> FilmElasticStorage:
-    return FilmElasticStorage(client)
+def get_film_elastic_storage(
+    client: AsyncElasticsearch = Depends(get_elastic),
+    batcher: ElasticMultiSearchBatcher | None = Depends(get_elastic_batcher),
+) -> FilmElasticStorage:
+    return FilmElasticStorage(client, batcher)
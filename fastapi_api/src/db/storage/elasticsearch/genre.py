@@ -3,17 +3,22 @@ from functools import lru_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
-from db.storage.elasticsearch import get_elastic
+from db.storage.base import get_source_fields
+from db.storage.elasticsearch import get_elastic, get_elastic_batcher
 from db.storage.elasticsearch.base import BaseElasticStorage
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
 from models.genre import Genre
 
 
 class GenreElasticStorage(BaseElasticStorage[Genre]):
     index_name = "genres"
     model_type = Genre
-    result_fields = None
+    result_fields = get_source_fields(Genre)
 
 
 @lru_cache
-def get_genre_elastic_storage(client: AsyncElasticsearch = Depends(get_elastic)) -> GenreElasticStorage:
-    return GenreElasticStorage(client)
+def get_genre_elastic_storage(
+    client: AsyncElasticsearch = Depends(get_elastic),
+    batcher: ElasticMultiSearchBatcher | None = Depends(get_elastic_batcher),
+) -> GenreElasticStorage:
+    return GenreElasticStorage(client, batcher)
@@ -3,17 +3,22 @@ from functools import lru_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
-from db.storage.elasticsearch import get_elastic
+from db.storage.base import get_source_fields
+from db.storage.elasticsearch import get_elastic, get_elastic_batcher
 from db.storage.elasticsearch.base import BaseElasticStorage
+from db.storage.elasticsearch.batcher import ElasticMultiSearchBatcher
 from models.person import BasePerson
 
 
 class PersonElasticStorage(BaseElasticStorage[BasePerson]):
     index_name = "persons"
     model_type = BasePerson
-    result_fields = None
+    result_fields = get_source_fields(BasePerson)
 
 
 @lru_cache
-def get_person_elastic_storage(client: AsyncElasticsearch = Depends(get_elastic)) -> PersonElasticStorage:
-    return PersonElasticStorage(client)
+def get_person_elastic_storage(
+    client: AsyncElasticsearch = Depends(get_elastic),
+    batcher: ElasticMultiSearchBatcher | None = Depends(get_elastic_batcher),
+) -> PersonElasticStorage:
+    return PersonElasticStorage(client, batcher)
@@ -0,0 +1,41 @@
+from elasticsearch import AsyncElasticsearch
+from pydantic import BaseModel
+
+
+class ElasticNodePoolStats(BaseModel):
+    node: str
+    connections_limit: int
+    in_use: int
+    idle: int
+    waiting: int
+
+    @property
+    def saturation(self) -> float:
+        """Share of the node connections that are busy with requests."""
+        return self.in_use / self.connections_limit if self.connections_limit else 0.0
+
+
+def get_elastic_pool_stats(client: AsyncElasticsearch) -> list[ElasticNodePoolStats]:
+    """
+    Returns the state of the connection pools of the client nodes.
+
+    The pools belong to aiohttp connectors that the nodes create on the first request,
+    the nodes without requests yet are reported with empty pools. The connector keeps the pool state in private
+    attributes, they are read with defaults so that another aiohttp version reports empty pools instead of failing.
+    """
+    stats = []
+
+    for node in client.transport.node_pool.all():
+        session = getattr(node, "session", None)
+        connector = session.connector if session is not None else None
+        stats.append(
+            ElasticNodePoolStats(
+                node=node.base_url,
+                connections_limit=node.config.connections_per_node,
+                in_use=len(getattr(connector, "_acquired", ())),
+                idle=sum(len(connections) for connections in getattr(connector, "_conns", {}).values()),
+                waiting=sum(len(waiters) for waiters in getattr(connector, "_waiters", {}).values()),
+            )
+        )
+
+    return stats
@@ -0,0 +1,73 @@
+"""Compares the cache key builder with the recursive string serialization it replaced."""
+from datetime import date, datetime
+from itertools import chain
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel
+
+from utils import report
+
+from db.storage.cache.base import AbstractAsyncCacheStorage
+
+
+def serialize_cached_function_param(param: any, separator_for_mapping_param: str = "___") -> str | None:
+    if isinstance(param, (str, int, float, UUID)):
+        return str(param)
+    elif isinstance(param, (date, datetime)):
+        return param.isoformat()
+    elif isinstance(param, (dict, BaseModel)) and len(separator_for_mapping_param) < 10:
+        if isinstance(param, BaseModel):
+            param = param.dict()
+        keys_values = []
+        for key, value in param.items():
+            serialized_value = serialize_cached_function_param(value, separator_for_mapping_param + "_")
+            if serialized_value is None:
+                continue
+            keys_values.append(f"{key} === {serialized_value}")
+        return separator_for_mapping_param.join(keys_values)
+
+    return None
+
+
+def get_legacy_cache_key(func: callable, *args, **kwargs) -> str:
+    prefix_cache_key = ".".join([func.__module__, func.__qualname__])
+    params_cache_key = [serialize_cached_function_param(func_param) for func_param in chain(args, kwargs.values())]
+    return "__".join(chain([prefix_cache_key], [key for key in params_cache_key if key is not None]))
+
+
+class FilmListFilter(BaseModel):
+    genre: UUID | None
+
+
+class FilmService:
+    async def get_films(self, **kwargs):
+        pass
+
+
+if __name__ == "__main__":
+    service = FilmService()
+    get_film_kwargs = {"film_id": uuid4()}
+    get_films_kwargs = {
+        "filters": FilmListFilter(genre=uuid4()),
+        "sort": "-imdb_rating",
+        "page_size": 50,
+        "page_num": 3,
+    }
+
+    report(
+        "get_film(film_id)",
+        {
+            "legacy string key": lambda: get_legacy_cache_key(FilmService.get_films, service, **get_film_kwargs),
+            # `cache_decorator` leaves the service instance out of the key
+            "digest key": lambda: AbstractAsyncCacheStorage.get_cache_key(FilmService.get_films, **get_film_kwargs),
+        },
+        number=20000,
+    )
+    report(
+        "get_films(filters, sort, page_size, page_num)",
+        {
+            "legacy string key": lambda: get_legacy_cache_key(FilmService.get_films, service, **get_films_kwargs),
+            "digest key": lambda: AbstractAsyncCacheStorage.get_cache_key(FilmService.get_films, **get_films_kwargs),
+        },
+        number=20000,
+    )
@@ -0,0 +1,47 @@
+"""Compares the size and the time of the cached film document compressed by each installed algorithm and level."""
+import json
+
+from utils import report
+
+from db.storage.cache.compression import CompressionAlgorithms, Compressor, decompress, is_algorithm_available
+
+LEVELS = {
+    CompressionAlgorithms.ZLIB: [1, 6],
+    CompressionAlgorithms.ZSTD: [1, 3],
+    CompressionAlgorithms.LZ4: [0, 9],
+}
+
+
+def make_film(persons: int = 36) -> bytes:
+    return json.dumps(
+        {
+            "uuid": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+            "title": "Star Wars: Episode IV - A New Hope",
+            "imdb_rating": 8.6,
+            "description": "The Imperial Forces, under orders from cruel Darth Vader, hold Princess Leia hostage "
+            "in their efforts to quell the rebellion against the Galactic Empire.",
+            "genres": [{"uuid": f"00000000-0000-0000-0001-{i:012}", "name": f"Genre {i}"} for i in range(3)],
+            "actors": [
+                {"uuid": f"00000000-0000-0000-0000-{i:012}", "full_name": f"Actor Number {i}"} for i in range(persons)
+            ],
+        }
+    ).encode()
+
+
+if __name__ == "__main__":
+    film = make_film()
+    compressors = {
+        f"{algorithm.value} level {level}": Compressor(algorithm, threshold=0, level=level)
+        for algorithm, levels in LEVELS.items()
+        if is_algorithm_available(algorithm)
+        for level in levels
+    }
+    print(f"film document: {len(film)} bytes")  # noqa: T201
+
+    compressed_films = {name: compressor.compress(film) for name, compressor in compressors.items()}
+
+    for name, compressed in compressed_films.items():
+        print(f"  {name:<40} {len(compressed):10} bytes  {len(compressed) / len(film):.0%}")  # noqa: T201
+
+    report("compress", {name: lambda c=compressor: c.compress(film) for name, compressor in compressors.items()})
+    report("decompress", {name: lambda v=value: decompress(v) for name, value in compressed_films.items()})
@@ -0,0 +1,103 @@
+"""
+Compares the encoding of the storage models with the fields of the response schema to the rebuilding of the models
+as the schema followed by the validation and serialization of `response_model` it replaced.
+"""
+import asyncio
+from uuid import uuid4
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from utils import report
+
+from api.v1.responses import encode_response
+from api.v1.schemas.film import BaseFilm, Film, FilmListWithPagination
+from models.film import Film as StorageFilm
+
+
+def make_person() -> dict[str, any]:
+    return {"id": uuid4(), "name": "Some Person"}
+
+
+def make_film(persons: int = 10) -> StorageFilm:
+    return StorageFilm(
+        id=uuid4(),
+        title="Lunar: The Silver Star",
+        imdb_rating=9.2,
+        release_date="2008-09-15",
+        age_limit="General Audiences",
+        description="From the village of Burg, a teenager named Alex sets out to become the fabled..." * 3,
+        genres=[{"id": uuid4(), "name": "Action"} for _ in range(3)],
+        actors=[make_person() for _ in range(persons - 2)],
+        writers=[make_person()],
+        directors=[make_person()],
+    )
+
+
+def rebuild_film(film: StorageFilm) -> Film:
+    return Film(
+        uuid=film.uuid,
+        title=film.title,
+        imdb_rating=film.imdb_rating,
+        release_date=film.release_date,
+        age_limit=film.age_limit,
+        description=film.description,
+        genres=film.genres,
+        actors=film.actors,
+        writers=film.writers,
+        directors=film.directors,
+    )
+
+
+def rebuild_films_page(films: list[StorageFilm]) -> FilmListWithPagination:
+    return FilmListWithPagination(
+        count=500,
+        total_pages=10,
+        prev=None,
+        next=2,
+        results=[
+            BaseFilm(
+                uuid=film.uuid,
+                title=film.title,
+                imdb_rating=film.imdb_rating,
+                release_date=film.release_date,
+                age_limit=film.age_limit,
+            )
+            for film in films
+        ],
+    )
+
+
+if __name__ == "__main__":
+    loop = asyncio.new_event_loop()
+    film_field = create_response_field("film", Film)
+    page_field = create_response_field("page", FilmListWithPagination)
+
+    def serialize(field, content) -> bytes:
+        return JSONResponse(loop.run_until_complete(serialize_response(field=field, response_content=content))).body
+
+    film = make_film()
+    films = [make_film() for _ in range(50)]
+
+    def encode_films_page() -> bytes:
+        return encode_response(
+            FilmListWithPagination.construct(count=500, total_pages=10, prev=None, next=2, results=films)
+        )
+
+    variants = {
+        "film details with 10 persons": {
+            "rebuild + response_model": lambda: serialize(film_field, rebuild_film(film)),
+            "encode_response": lambda: encode_response(film, Film),
+        },
+        "page of 50 films": {
+            "rebuild + response_model": lambda: serialize(page_field, rebuild_films_page(films)),
+            "encode_response": encode_films_page,
+        },
+    }
+
+    for title, functions in variants.items():
+        old, new = functions.values()
+        assert orjson.loads(old()) == orjson.loads(new()), f"{title}: the responses differ"
+        report(title, functions, number=200)
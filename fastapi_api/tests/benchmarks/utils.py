@@ -0,0 +1,28 @@
+"""
+Helpers of the micro-benchmarks. A benchmark is a script run from this directory, e.g. `python bench_cache_key.py`,
+it prints the best time of a call of each variant.
+"""
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable
+
+SRC_DIR = Path(__file__).resolve().parents[2] / "src"
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+def measure(func: Callable[[], object], number: int = 1000, repeat: int = 5) -> float:
+    """Returns the best time of a call of the function in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def report(title: str, variants: dict[str, Callable[[], object]], number: int = 1000):
+    """Prints the time of a call of each variant and its speedup relative to the first one."""
+    timings = {name: measure(func, number) for name, func in variants.items()}
+    baseline = next(iter(timings.values()))
+    print(title)  # noqa: T201
+
+    for name, timing in timings.items():
+        print(f"  {name:<40} {timing:10.2f} us  x{baseline / timing:.2f}")  # noqa: T201
@@ -0,0 +1,56 @@
+import base64
+import time
+
+import orjson
+import pytest
+
+from db.storage.cache.access import AccessDecisionCache, get_token_expiration
+
+
+def make_token(claims: object) -> str:
+    payload = base64.urlsafe_b64encode(orjson.dumps(claims)).rstrip(b"=").decode()
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.signature"
+
+
+class TestTokenExpiration:
+    def test_exp_claim(self):
+        assert get_token_expiration(make_token({"sub": "user", "exp": 1700000000})) == 1700000000.0
+
+    @pytest.mark.parametrize(
+        "token",
+        [
+            make_token({"sub": "user"}),
+            make_token({"exp": "tomorrow"}),
+            make_token(["not", "claims"]),
+            "not-a-jwt",
+            "header.%%%.signature",
+            "header.bm90IGpzb24.signature",
+            "a.éé.b",
+        ],
+    )
+    def test_no_expiration(self, token):
+        assert get_token_expiration(token) is None
+
+
+class TestAccessDecisionTtl:
+    @pytest.fixture
+    def decisions(self):
+        return AccessDecisionCache(cache=None, ttl=30)
+
+    def test_anonymous(self, decisions):
+        assert decisions.get_ttl("") == 30
+
+    def test_token_without_expiration(self, decisions):
+        assert decisions.get_ttl(make_token({"sub": "user"})) == 30
+
+    def test_long_lived_token(self, decisions):
+        assert decisions.get_ttl(make_token({"exp": time.time() + 3600})) == 30
+
+    def test_token_expiring_soon(self, decisions):
+        """
+        The decision is not kept longer than the token is valid
+        """
+        assert 0 < decisions.get_ttl(make_token({"exp": time.time() + 10.5})) <= 10
+
+    def test_expired_token(self, decisions):
+        assert decisions.get_ttl(make_token({"exp": time.time() - 10})) <= 0
@@ -0,0 +1,65 @@
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+from pydantic import BaseModel
+
+from db.storage.cache import codecs
+from db.storage.cache.base import CacheEnvelope
+from db.storage.cache.codecs import CodecNames, JsonCodec, MsgpackCodec, decode, get_codec, msgpack
+
+
+class Person(BaseModel):
+    uuid: UUID
+    full_name: str
+
+
+class Film(BaseModel):
+    uuid: UUID
+    title: str
+    imdb_rating: float | None
+    created: datetime
+    actors: list[Person]
+    films_by_year: dict[int, int]
+
+
+FILM = Film(
+    uuid="3fa85f64-5717-4562-b3fc-2c963f66afa6",
+    title="Star Wars",
+    imdb_rating=None,
+    created=datetime(2023, 1, 2, 3, 4, 5),
+    actors=[Person(uuid="00000000-0000-0000-0000-000000000001", full_name="Mark Hamill")],
+    films_by_year={1977: 1, 1980: 2},
+)
+
+CODECS = [
+    JsonCodec(),
+    pytest.param(MsgpackCodec(), marks=pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")),
+]
+
+
+class TestCacheCodecs:
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_round_trip(self, codec):
+        assert decode(codec.encode(FILM), Film) == FILM
+
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_envelope_round_trip(self, codec):
+        envelope = CacheEnvelope[Film](value=FILM, fresh_until=1700000000.5, delta=0.25)
+
+        assert decode(codec.encode(envelope), CacheEnvelope[Film]) == envelope
+
+    def test_json_has_no_codec_id(self):
+        """
+        Json values are stored as is, so the values written before the codecs were introduced stay readable
+        """
+        assert JsonCodec().encode(FILM).startswith(b"{")
+
+    @pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+    def test_msgpack_codec_id(self):
+        assert MsgpackCodec().encode(FILM)[:1] == MsgpackCodec.codec_id
+
+    def test_missing_msgpack_falls_back_to_json(self, monkeypatch):
+        monkeypatch.setattr(codecs, "msgpack", None)
+
+        assert get_codec(CodecNames.MSGPACK).name == CodecNames.JSON
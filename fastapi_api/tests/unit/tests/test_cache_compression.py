@@ -0,0 +1,73 @@
+import json
+import os
+import zlib
+
+import pytest
+
+from db.storage.cache.base import NOT_FOUND_SENTINEL
+from db.storage.cache.compression import (
+    COMPRESSION_HEADERS,
+    CompressionAlgorithms,
+    Compressor,
+    decompress,
+    is_algorithm_available,
+)
+
+FILM = json.dumps(
+    {
+        "uuid": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+        "title": "Star Wars",
+        "description": "A long time ago in a galaxy far, far away... " * 10,
+        "actors": [{"uuid": f"00000000-0000-0000-0000-{i:012}", "full_name": f"Actor {i}"} for i in range(30)],
+    }
+).encode()
+
+
+class TestCompressor:
+    @pytest.mark.parametrize("algorithm", list(CompressionAlgorithms))
+    def test_round_trip(self, algorithm):
+        if not is_algorithm_available(algorithm):
+            pytest.skip(f"{algorithm.value} is not installed")
+
+        compressed = Compressor(algorithm, threshold=100).compress(FILM)
+
+        assert compressed[:1] == COMPRESSION_HEADERS[algorithm]
+        assert len(compressed) < len(FILM)
+        assert decompress(compressed) == FILM
+
+    def test_short_value_is_not_compressed(self):
+        assert Compressor(CompressionAlgorithms.ZLIB, threshold=len(FILM) + 1).compress(FILM) == FILM
+
+    def test_incompressible_value_is_kept_as_is(self):
+        value = os.urandom(4096)
+
+        assert Compressor(CompressionAlgorithms.ZLIB, threshold=100).compress(value) == value
+
+    def test_level_zero_is_kept(self):
+        """
+        Zero is a valid level, it is not replaced by the default one
+        """
+        compressor = Compressor(CompressionAlgorithms.ZLIB, threshold=100, level=0)
+
+        assert compressor.level == 0
+        assert compressor._compress(FILM) == zlib.compress(FILM, 0)
+
+    def test_default_level(self):
+        assert Compressor(CompressionAlgorithms.ZLIB, threshold=100).level == zlib.Z_DEFAULT_COMPRESSION
+
+    @pytest.mark.parametrize("algorithm", [CompressionAlgorithms.ZSTD, CompressionAlgorithms.LZ4])
+    def test_missing_algorithm_falls_back_to_zlib(self, algorithm):
+        if is_algorithm_available(algorithm):
+            pytest.skip(f"{algorithm.value} is installed")
+
+        compressor = Compressor(algorithm, threshold=100)
+
+        assert compressor.algorithm == CompressionAlgorithms.ZLIB
+        assert compressor.compress(FILM)[:1] == COMPRESSION_HEADERS[CompressionAlgorithms.ZLIB]
+
+    @pytest.mark.parametrize("value", [FILM, NOT_FOUND_SENTINEL + b"Film not found.", b""])
+    def test_uncompressed_values_are_read_as_is(self, value):
+        """
+        Values stored before the compression was enabled and the negative cache entries stay readable
+        """
+        assert decompress(value) == value
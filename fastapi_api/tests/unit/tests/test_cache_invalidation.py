@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from db.storage.cache.invalidation import CacheInvalidationListener, InvalidationMessage
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+
+PERSON_ID = "afbdbaca-04e2-44ca-8bef-da1ae4d84cdf"
+OTHER_PERSON_ID = "6f822a92-7b51-4753-8d00-ecfedf98a937"
+FILM_ID = "b31592e5-673d-46dc-a561-9446438aea0f"
+
+
+@pytest.fixture
+def cache():
+    return MemoryAsyncCacheStorage(max_items=10, max_bytes=10000)
+
+
+def cache_filmography(cache: MemoryAsyncCacheStorage, person_id: str, film_ids: list[str]):
+    tags = [
+        cache.get_reference_tag("movies", "persons", person_id),
+        *(cache.get_entity_tag("movies", film_id) for film_id in film_ids),
+    ]
+    asyncio.run(cache.set_raw(f"filmography:{person_id}", b"[]", ttl=60, tags=tags))
+
+
+def invalidate(cache: MemoryAsyncCacheStorage, message: InvalidationMessage):
+    asyncio.run(CacheInvalidationListener(client=None, channel="invalidation", cache=cache).invalidate(message))
+
+
+def get_cached(cache: MemoryAsyncCacheStorage, key: str) -> bytes | None:
+    return asyncio.run(cache.get_raw(key))
+
+
+class TestFilmographyInvalidation:
+    def test_person_added_to_film(self, cache):
+        """
+        The filmography of a person is evicted when a film not on its pages refers to the person now
+        """
+        cache_filmography(cache, PERSON_ID, [])
+        cache_filmography(cache, OTHER_PERSON_ID, [])
+
+        invalidate(cache, InvalidationMessage(index="movies", ids=[FILM_ID], references={"persons": [PERSON_ID]}))
+
+        assert get_cached(cache, f"filmography:{PERSON_ID}") is None
+        assert get_cached(cache, f"filmography:{OTHER_PERSON_ID}") == b"[]"
+
+    def test_film_on_page_changed(self, cache):
+        """
+        A person removed from a film is not published with it, the pages with the film are evicted by its id
+        """
+        cache_filmography(cache, PERSON_ID, [FILM_ID])
+
+        invalidate(cache, InvalidationMessage(index="movies", ids=[FILM_ID], references={"persons": []}))
+
+        assert get_cached(cache, f"filmography:{PERSON_ID}") is None
+
+    def test_message_without_references(self, cache):
+        cache_filmography(cache, PERSON_ID, [])
+
+        invalidate(cache, InvalidationMessage.parse_raw(f'{{"index": "movies", "ids": ["{FILM_ID}"]}}'))
+
+        assert get_cached(cache, f"filmography:{PERSON_ID}") == b"[]"
@@ -0,0 +1,69 @@
+import asyncio
+from uuid import UUID
+
+import pytest
+from pydantic import BaseModel
+
+from db.storage.cache.base import AbstractAsyncCacheStorage
+from db.storage.cache.memory import MemoryAsyncCacheStorage
+
+GENRE_ID = UUID("6f822a92-7b51-4753-8d00-ecfedf98a937")
+
+
+class FilmListFilter(BaseModel):
+    genre: UUID | None
+
+
+class FilmPage(BaseModel):
+    films: list[str]
+
+
+class Connection:
+    pass
+
+
+def get_films():
+    pass
+
+
+class TestCacheKey:
+    def test_model_params(self):
+        """
+        Models are encoded by their fields, so equal filters give the same key
+        """
+        assert AbstractAsyncCacheStorage.get_cache_key(
+            get_films, filters=FilmListFilter(genre=GENRE_ID)
+        ) == AbstractAsyncCacheStorage.get_cache_key(get_films, filters=FilmListFilter(genre=str(GENRE_ID)))
+
+    def test_different_params(self):
+        assert AbstractAsyncCacheStorage.get_cache_key(
+            get_films, filters=FilmListFilter(genre=GENRE_ID)
+        ) != AbstractAsyncCacheStorage.get_cache_key(get_films, filters=FilmListFilter(genre=None))
+
+    def test_unserializable_param(self):
+        """
+        An object would be reduced to its type and collide with the other objects of the type
+        """
+        with pytest.raises(TypeError):
+            AbstractAsyncCacheStorage.get_cache_key(get_films, connection=Connection())
+
+
+class TestCacheDecorator:
+    def test_method_instance_is_not_a_param(self):
+        cache = MemoryAsyncCacheStorage(max_items=10, max_bytes=10000)
+
+        class FilmService:
+            def __init__(self):
+                self.calls = 0
+
+            @cache.cache_decorator(model_type=FilmPage, ttl=60)
+            async def get_films(self, filters: FilmListFilter) -> FilmPage:
+                self.calls += 1
+                return FilmPage(films=[str(filters.genre)])
+
+        service = FilmService()
+        asyncio.run(service.get_films(filters=FilmListFilter(genre=GENRE_ID)))
+        page = asyncio.run(FilmService().get_films(filters=FilmListFilter(genre=GENRE_ID)))
+
+        assert page == FilmPage(films=[str(GENRE_ID)])
+        assert service.calls == 1
@@ -0,0 +1,68 @@
+from db.storage.base import AggregationEntity, AggregationTypes
+from db.storage.elasticsearch.base import BaseElasticStorage
+
+GENRES = AggregationEntity(name="genres", field_name="genres.id", label_field="genres.name", size=50)
+YEARS = AggregationEntity(name="years", field_name="release_date", aggregation_type=AggregationTypes.YEAR_HISTOGRAM)
+AGE_LIMITS = AggregationEntity(name="age_limits", field_name="age_limit")
+
+
+class TestElasticAggregations:
+    def test_no_aggregations(self):
+        assert BaseElasticStorage.get_elastic_aggregations(()) is None
+
+    def test_terms(self):
+        assert BaseElasticStorage.get_elastic_aggregations((AGE_LIMITS,)) == {
+            "age_limits": {"terms": {"field": "age_limit", "size": 10}}
+        }
+
+    def test_year_histogram(self):
+        assert BaseElasticStorage.get_elastic_aggregations((YEARS,)) == {
+            "years": {
+                "date_histogram": {
+                    "field": "release_date",
+                    "calendar_interval": "year",
+                    "format": "yyyy",
+                    "min_doc_count": 1,
+                }
+            }
+        }
+
+    def test_nested_terms_with_label(self):
+        """
+        Terms of a nested field are counted inside the `nested` aggregation, the label comes from `top_hits`
+        """
+        assert BaseElasticStorage.get_elastic_aggregations((GENRES,)) == {
+            "genres": {
+                "nested": {"path": "genres"},
+                "aggs": {
+                    "genres": {
+                        "terms": {"field": "genres.id", "size": 50},
+                        "aggs": {"label": {"top_hits": {"size": 1, "_source": {"includes": ["genres.name"]}}}},
+                    }
+                },
+            }
+        }
+
+    def test_buckets(self):
+        docs = {
+            "aggregations": {
+                "genres": {
+                    "doc_count": 3,
+                    "genres": {
+                        "buckets": [
+                            {
+                                "key": "6f822a92",
+                                "doc_count": 2,
+                                "label": {"hits": {"hits": [{"_source": {"name": "Action"}}]}},
+                            }
+                        ]
+                    },
+                },
+                "years": {"buckets": [{"key": 1199145600000, "key_as_string": "2008", "doc_count": 1}]},
+            }
+        }
+        buckets = BaseElasticStorage.get_aggregation_buckets((GENRES, YEARS, AGE_LIMITS), docs)
+
+        assert [bucket.dict() for bucket in buckets["genres"]] == [{"key": "6f822a92", "count": 2, "label": "Action"}]
+        assert [bucket.dict() for bucket in buckets["years"]] == [{"key": "2008", "count": 1, "label": None}]
+        assert buckets["age_limits"] == []
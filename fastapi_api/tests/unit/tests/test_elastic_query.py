@@ -0,0 +1,154 @@
+import pytest
+
+from db.storage.base import (
+    ComparisonOperators,
+    FilterEntity,
+    FilterGroup,
+    LogicalGroupOperators,
+    SearchString,
+    SearchTypes,
+)
+from db.storage.elasticsearch.base import BaseElasticStorage
+
+GENRE_ID = "6f822a92-7b51-4753-8d00-ecfedf98a937"
+OTHER_GENRE_ID = "00f74939-18b1-42e4-b541-b52f667d50d9"
+
+GENRE_FILTER = FilterEntity(field_name="genres.id", value=GENRE_ID)
+OTHER_GENRE_FILTER = FilterEntity(field_name="genres.id", value=OTHER_GENRE_ID)
+RATING_FILTER = FilterEntity(field_name="imdb_rating", comparison_operator=ComparisonOperators.RANGE, value=(7, 10))
+SEARCH = SearchString(search_string="star", search_fields=["title", "description"], type_search=SearchTypes.FUZZY)
+
+GENRE_TERM = {"nested": {"path": "genres", "query": {"term": {"genres.id": GENRE_ID}}}}
+OTHER_GENRE_TERM = {"nested": {"path": "genres", "query": {"term": {"genres.id": OTHER_GENRE_ID}}}}
+RATING_RANGE = {"range": {"imdb_rating": {"gte": 7, "lte": 10}}}
+SEARCH_MATCH = {"multi_match": {"query": "star", "fields": ["title", "description"], "fuzziness": "auto"}}
+
+
+class TestElasticQueryCompiler:
+    @pytest.fixture
+    def query(self):
+        return BaseElasticStorage(client=None).query()
+
+    def test_empty_query(self, query):
+        assert BaseElasticStorage.get_elastic_query(query) is None
+
+    def test_search_only(self, query):
+        """
+        Full-text search without filters stays a scoring query
+        """
+        assert BaseElasticStorage.get_elastic_query(query.search(SEARCH)) == SEARCH_MATCH
+
+    def test_clear_search(self, query):
+        search = SearchString(search_string="star", search_fields=["title"], type_search=SearchTypes.CLEAR)
+
+        assert BaseElasticStorage.get_elastic_query(query.search(search)) == {
+            "multi_match": {"query": "star", "fields": ["title"]}
+        }
+
+    @pytest.mark.parametrize(
+        "filters, expected",
+        [
+            ([GENRE_FILTER], {"bool": {"filter": [GENRE_TERM]}}),
+            ([RATING_FILTER], {"bool": {"filter": [RATING_RANGE]}}),
+            ([GENRE_FILTER, RATING_FILTER], {"bool": {"filter": [GENRE_TERM, RATING_RANGE]}}),
+            (
+                [FilterEntity(field_name="id", comparison_operator=ComparisonOperators.IN, value=["1", "2"])],
+                {"bool": {"filter": [{"terms": {"id": ["1", "2"]}}]}},
+            ),
+        ],
+    )
+    def test_filters_in_filter_context(self, query, filters, expected):
+        """
+        Structured filters go to `bool.filter` and never to the scoring `bool.must`
+        """
+        for filter_entity in filters:
+            query = query.filter(filter_entity)
+
+        assert BaseElasticStorage.get_elastic_query(query) == expected
+
+    def test_or_group(self, query):
+        group = FilterGroup(
+            logical_group_operator=LogicalGroupOperators.OR, entities=[GENRE_FILTER, OTHER_GENRE_FILTER]
+        )
+
+        assert BaseElasticStorage.get_elastic_query(query.filter(group)) == {
+            "bool": {
+                "filter": [{"bool": {"should": [GENRE_TERM, OTHER_GENRE_TERM], "minimum_should_match": 1}}],
+            }
+        }
+
+    def test_nested_groups(self, query):
+        group = FilterGroup(
+            logical_group_operator=LogicalGroupOperators.AND,
+            entities=[
+                RATING_FILTER,
+                FilterGroup(
+                    logical_group_operator=LogicalGroupOperators.OR, entities=[GENRE_FILTER, OTHER_GENRE_FILTER]
+                ),
+            ],
+        )
+
+        assert BaseElasticStorage.get_elastic_query(query.filter(group)) == {
+            "bool": {
+                "filter": [
+                    RATING_RANGE,
+                    {"bool": {"should": [GENRE_TERM, OTHER_GENRE_TERM], "minimum_should_match": 1}},
+                ],
+            }
+        }
+
+    def test_search_with_filter(self, query):
+        """
+        The search query is kept in `bool.must` next to the filter
+        """
+        assert BaseElasticStorage.get_elastic_query(query.search(SEARCH).filter(GENRE_FILTER)) == {
+            "bool": {"must": [SEARCH_MATCH], "filter": [GENRE_TERM]}
+        }
+
+    def test_search_with_filters(self, query):
+        query = query.search(SEARCH).filter(GENRE_FILTER).filter(RATING_FILTER)
+
+        assert BaseElasticStorage.get_elastic_query(query) == {
+            "bool": {"must": [SEARCH_MATCH], "filter": [GENRE_TERM, RATING_RANGE]}
+        }
+
+    def test_same_structure_is_compiled_once(self, query):
+        """
+        Queries that differ only in values share the compiled template
+        """
+        BaseElasticStorage.compile_elastic_query.cache_clear()
+
+        first = BaseElasticStorage.get_elastic_query(query.search(SEARCH).filter(GENRE_FILTER))
+        second = BaseElasticStorage.get_elastic_query(query.search(SEARCH).filter(OTHER_GENRE_FILTER))
+
+        assert first == {"bool": {"must": [SEARCH_MATCH], "filter": [GENRE_TERM]}}
+        assert second == {"bool": {"must": [SEARCH_MATCH], "filter": [OTHER_GENRE_TERM]}}
+        assert BaseElasticStorage.compile_elastic_query.cache_info().misses == 1
+        assert BaseElasticStorage.compile_elastic_query.cache_info().hits == 1
+
+    def test_rendered_query_does_not_share_template(self, query):
+        first = BaseElasticStorage.get_elastic_query(query.filter(GENRE_FILTER))
+        first["bool"]["filter"].append(RATING_RANGE)
+
+        assert BaseElasticStorage.get_elastic_query(query.filter(GENRE_FILTER)) == {"bool": {"filter": [GENRE_TERM]}}
+
+    def test_derived_builders_do_not_share_filters(self, query):
+        base_query = query.filter(GENRE_FILTER).filter(RATING_FILTER)
+        base_query.filter(OTHER_GENRE_FILTER)
+        base_query.sort()
+
+        assert BaseElasticStorage.get_elastic_query(base_query) == {"bool": {"filter": [GENRE_TERM, RATING_RANGE]}}
+
+    def test_prefix_search(self, query):
+        """
+        Prefix search queries the `search_as_you_type` field together with its shingle subfields
+        """
+        search = SearchString(search_string="star w", search_fields=["title.suggest"], type_search=SearchTypes.PREFIX)
+
+        assert BaseElasticStorage.get_elastic_query(query.search(search)) == {
+            "multi_match": {
+                "query": "star w",
+                "type": "bool_prefix",
+                "fields": ["title.suggest", "title.suggest._2gram", "title.suggest._3gram"],
+            }
+        }
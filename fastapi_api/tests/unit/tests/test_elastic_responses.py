@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from db.storage.base import CountModes, Cursor
+from db.storage.elasticsearch.base import BaseElasticStorage
+
+# with `filter_path` ElasticSearch drops `hits` when nothing matches, and `hits.hits` when the hits are counted
+NO_HITS_RESPONSES = {
+    CountModes.EXACT: {"hits": {"total": {"value": 0, "relation": "eq"}}},
+    CountModes.CAPPED: {"hits": {"total": {"value": 0, "relation": "eq"}}},
+    CountModes.NONE: {},
+}
+
+
+class Film(BaseModel):
+    id: str
+    title: str
+
+
+class FakeElastic:
+    def __init__(self, response: dict[str, any]):
+        self.response = response
+        self.searches = []
+        self.closed_points_in_time = []
+
+    async def search(self, **params) -> dict[str, any]:
+        self.searches.append(params)
+        return self.response
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict[str, any]:
+        return {"id": "pit"}
+
+    async def close_point_in_time(self, id: str) -> dict[str, any]:
+        self.closed_points_in_time.append(id)
+        return {}
+
+
+class FilmStorage(BaseElasticStorage[Film]):
+    index_name = "movies"
+    model_type = Film
+    result_fields = None
+
+
+def make_storage(response: dict[str, any]) -> tuple[FilmStorage, FakeElastic]:
+    client = FakeElastic(response)
+    storage = FilmStorage(client=None)
+    storage._clients = {"search": client, "point_in_time": client}
+    return storage, client
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.mark.parametrize("count_mode", list(CountModes))
+class TestNoHits:
+    def test_fetch(self, count_mode):
+        storage, _ = make_storage(NO_HITS_RESPONSES[count_mode])
+
+        assert run(storage.fetch(storage.query().count(count_mode))) is None
+
+    def test_fetch_count(self, count_mode):
+        storage, _ = make_storage(NO_HITS_RESPONSES[count_mode])
+
+        assert run(storage.fetch_count(storage.query().count(count_mode))) is None
+
+    def test_fetch_next(self, count_mode):
+        storage, client = make_storage(NO_HITS_RESPONSES[count_mode])
+
+        page = run(storage.fetch_next(storage.query().count(count_mode)))
+
+        assert page.entities == []
+        assert page.next_cursor is None
+        assert page.count == (None if count_mode == CountModes.NONE else 0)
+        assert client.closed_points_in_time == ["pit"]
+
+
+class TestScan:
+    @staticmethod
+    async def collect(storage: FilmStorage, cursor: Cursor | None) -> list[tuple[Film, Cursor]]:
+        return [item async for item in storage.scan(storage.query().after(cursor), batch_size=2)]
+
+    def test_cursor_past_the_end(self):
+        """
+        Resuming after the last film gives an empty export instead of failing on the missing `hits`
+        """
+        storage, client = make_storage({})
+
+        assert run(self.collect(storage, Cursor(point_in_time=None, search_after=["film-9"]))) == []
+        assert len(client.searches) == 1
+
+    def test_last_page_is_empty(self):
+        """
+        When the number of films is a multiple of the batch size, the page after the last one has no `hits`
+        """
+        pages = [
+            {
+                "pit_id": "pit",
+                "hits": {
+                    "hits": [
+                        {"_source": {"id": "1", "title": "A"}, "sort": ["1", 1]},
+                        {"_source": {"id": "2", "title": "B"}, "sort": ["2", 2]},
+                    ]
+                },
+            },
+            {"pit_id": "pit"},
+        ]
+        storage, client = make_storage({})
+
+        async def search(**params):
+            client.searches.append(params)
+            return pages[len(client.searches) - 1]
+
+        client.search = search
+
+        films = run(self.collect(storage, None))
+
+        assert [film.id for film, _ in films] == ["1", "2"]
+        assert films[-1][1] == Cursor(point_in_time=None, search_after=["2"])
+        assert client.closed_points_in_time == ["pit"]
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+# the films endpoints need the services and the auth service client, the tests are skipped where they are not installed
+pytest.importorskip("services.film")
+pytest.importorskip("grpc_auth_service")
+
+from api.v1.dependencies import Paginator  # noqa: E402
+from api.v1.film import films_page  # noqa: E402
+from db.storage.base import CountModes  # noqa: E402
+from db.storage.elasticsearch.film import FilmElasticStorage  # noqa: E402
+
+FILM_HIT = {"_source": {"id": "b31592e5-673d-46dc-a561-9446438aea0f", "title": "Lunar: The Silver Star"}}
+
+
+class FakeElastic:
+    def __init__(self, response: dict[str, any]):
+        self.response = response
+        self.searches = []
+
+    async def search(self, **params) -> dict[str, any]:
+        self.searches.append(params)
+        return self.response
+
+
+def get_films_page(response: dict[str, any], paginator: Paginator, count_mode: CountModes):
+    client = FakeElastic(response)
+    storage = FilmElasticStorage(client=None)
+    storage._clients = {"search": client}
+    page = asyncio.run(films_page(storage.query(), paginator, count_mode))
+    return page, client.searches[0]
+
+
+class TestFilmsPage:
+    @pytest.mark.parametrize(
+        "count_mode, track_total_hits", [(CountModes.EXACT, True), (CountModes.CAPPED, 500), (CountModes.NONE, False)]
+    )
+    def test_count_mode(self, count_mode, track_total_hits):
+        """
+        Capped counts stop at the last page the paginator can reach
+        """
+        _, search = get_films_page({"hits": {"hits": [FILM_HIT]}}, Paginator(page=1, size=10), count_mode)
+
+        assert search["track_total_hits"] == track_total_hits
+
+    def test_capped_count(self):
+        response = {"hits": {"total": {"value": 500, "relation": "gte"}, "hits": [FILM_HIT] * 10}}
+
+        page, _ = get_films_page(response, Paginator(page=2, size=10), CountModes.CAPPED)
+
+        assert (page.count, page.count_is_exact, page.total_pages, page.prev, page.next) == (500, False, 50, 1, 3)
+
+    @pytest.mark.parametrize("films, next_page", [(10, 3), (3, None)])
+    def test_not_counted(self, films, next_page):
+        """
+        Without the count only a full page may be followed by another one
+        """
+        page, _ = get_films_page({"hits": {"hits": [FILM_HIT] * films}}, Paginator(page=2, size=10), CountModes.NONE)
+
+        assert (page.count, page.total_pages, page.prev, page.next) == (None, None, 1, next_page)
+
+    @pytest.mark.parametrize("count_mode", list(CountModes))
+    def test_no_films(self, count_mode):
+        with pytest.raises(HTTPException) as error:
+            get_films_page({}, Paginator(page=1, size=10), count_mode)
+
+        assert error.value.status_code == 404
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from elasticsearch import BadRequestError
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from db.storage.base import Cursor, InvalidCursorError, SortEntity, SortingOrders
+from db.storage.elasticsearch.base import BaseElasticStorage
+
+RATING_DESC = SortEntity(field_name="imdb_rating", order=SortingOrders.DESC)
+
+
+class Film(BaseModel):
+    id: str
+    title: str
+
+
+class FakeElastic:
+    def __init__(self, response: dict[str, any]):
+        self.response = response
+        self.searches = []
+
+    async def search(self, **params) -> dict[str, any]:
+        self.searches.append(params)
+        return self.response
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict[str, any]:
+        return {"id": "pit"}
+
+    async def close_point_in_time(self, id: str) -> dict[str, any]:
+        return {}
+
+
+class FilmStorage(BaseElasticStorage[Film]):
+    index_name = "movies"
+    model_type = Film
+    result_fields = None
+
+
+def make_storage(response: dict[str, any]) -> tuple[FilmStorage, FakeElastic]:
+    client = FakeElastic(response)
+    storage = FilmStorage(client=None)
+    storage._clients = {"search": client, "point_in_time": client}
+    return storage, client
+
+
+def get_next_page(storage: FilmStorage, cursor: Cursor | None, *sorts: SortEntity):
+    return asyncio.run(storage.fetch_next(storage.query().sort(*sorts).after(cursor), batch_size=1))
+
+
+class TestPageCursors:
+    def test_next_cursor(self):
+        """
+        The cursor of the next page continues the pages of the same index and sorting
+        """
+        hits = [{"_source": {"id": str(i), "title": "A"}, "sort": [7.5, str(i), i]} for i in range(2)]
+        storage, client = make_storage(
+            {"pit_id": "pit", "hits": {"total": {"value": 2, "relation": "eq"}, "hits": hits}}
+        )
+
+        cursor = get_next_page(storage, None, RATING_DESC).next_cursor
+        get_next_page(storage, cursor, RATING_DESC)
+
+        assert cursor.scope == "movies,imdb_rating:desc"
+        assert client.searches[-1]["search_after"] == [7.5, "0", 0]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            # a page of the persons
+            Cursor(point_in_time="pit", search_after=[7.5, "0", 0], scope="persons,_score:desc"),
+            # a page of the films sorted otherwise
+            Cursor(point_in_time="pit", search_after=[7.5, "0", 0], scope="movies,imdb_rating:asc"),
+            Cursor(point_in_time="pit", search_after=[7.5, "0", 0]),
+        ],
+    )
+    def test_foreign_cursor(self, cursor):
+        storage, client = make_storage({})
+
+        with pytest.raises(InvalidCursorError):
+            get_next_page(storage, cursor, RATING_DESC)
+
+        assert client.searches == []
+
+    @pytest.mark.parametrize(
+        "search_after",
+        [[], ["0", 0], [7.5, "0"], [7.5, "0", 0, 0], [{"script": "..."}, "0", 0], [7.5, 0, 0], [7.5, "0", "0"]],
+    )
+    def test_malformed_cursor(self, search_after):
+        storage, client = make_storage({})
+        cursor = Cursor(point_in_time="pit", search_after=search_after, scope="movies,imdb_rating:desc")
+
+        with pytest.raises(InvalidCursorError):
+            get_next_page(storage, cursor, RATING_DESC)
+
+        assert client.searches == []
+
+    def test_rejected_cursor(self):
+        """
+        A tampered point in time passes the checks of the shape, ElasticSearch rejects it
+        """
+        storage, client = make_storage({})
+
+        async def search(**params):
+            raise BadRequestError("parse_exception", meta=None, body={})
+
+        client.search = search
+
+        with pytest.raises(InvalidCursorError):
+            get_next_page(storage, Cursor(point_in_time="tampered", search_after=["0", 0], scope="movies"))
+
+
+class TestPageCursorEndpoints:
+    def test_malformed_cursor(self):
+        dependencies = pytest.importorskip("api.v1.dependencies")
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(dependencies.get_page_cursor("bm90IGEgY3Vyc29y"))
+
+        assert error.value.status_code == 400
+
+    def test_foreign_cursor(self):
+        """
+        A cursor of the persons search given to the films list
+        """
+        film_route = pytest.importorskip("api.v1.film")
+        from api.v1.dependencies import FilmListFilter, PageCursor
+
+        storage, client = make_storage({})
+        cursor = Cursor(point_in_time="pit", search_after=[7.5, "0", 0], scope="persons,_score:desc")
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(
+                film_route.films_list_by_cursor(
+                    storage, FilmListFilter(genre=None), None, PageCursor(enabled=True, cursor=cursor), 10
+                )
+            )
+
+        assert error.value.status_code == 400
+        assert client.searches == []
@@ -0,0 +1,79 @@
+import orjson
+import pytest
+from pydantic import BaseModel
+
+# the storage models are compared with the response schemas, the tests are skipped where they are not installed
+storage_films = pytest.importorskip("models.film")
+storage_genres = pytest.importorskip("models.genre")
+storage_persons = pytest.importorskip("models.person")
+
+from api.v1.responses import encode_response  # noqa: E402
+from api.v1.schemas.film import BaseFilm, Film, FilmListWithPagination, FilmSuggestion  # noqa: E402
+from api.v1.schemas.genre import Genre, GenreListWithPagination  # noqa: E402
+from api.v1.schemas.person import BasePerson  # noqa: E402
+
+GENRE_DOCUMENT = {"id": "6f822a92-7b51-4753-8d00-ecfedf98a937", "name": "Action"}
+PERSON_DOCUMENT = {"id": "afbdbaca-04e2-44ca-8bef-da1ae4d84cdf", "name": "Ashley Parker Angel"}
+FILM_DOCUMENT = {
+    "id": "b31592e5-673d-46dc-a561-9446438aea0f",
+    "title": "Lunar: The Silver Star",
+    "imdb_rating": 9.2,
+    "release_date": "2008-09-15",
+    "age_limit": "General Audiences",
+    "description": "From the village of Burg, a teenager named Alex sets out to become the fabled...",
+    "genres": [GENRE_DOCUMENT],
+    "actors": [PERSON_DOCUMENT],
+    "writers": [],
+    "directors": None,
+}
+EMPTY_FILM_DOCUMENT = {"id": "223e4317-e89b-22d3-f3b6-426614174000", "title": "Billion Star Hotel"}
+
+
+def assert_encoded_as_schema(content: BaseModel | list[BaseModel], schema: type[BaseModel]):
+    """The storage models are encoded as if they were rebuilt and validated as the response schema."""
+    if isinstance(content, list):
+        expected = [orjson.loads(schema(**model.dict()).json()) for model in content]
+    else:
+        expected = orjson.loads(schema(**content.dict()).json())
+
+    assert orjson.loads(encode_response(content, schema)) == expected
+
+
+class TestEncodeResponse:
+    @pytest.mark.parametrize("document", [FILM_DOCUMENT, EMPTY_FILM_DOCUMENT])
+    @pytest.mark.parametrize("schema", [Film, BaseFilm, FilmSuggestion])
+    def test_film(self, document, schema):
+        assert_encoded_as_schema(storage_films.Film.parse_obj(document), schema)
+
+    def test_genre(self):
+        assert_encoded_as_schema(storage_genres.Genre.parse_obj(GENRE_DOCUMENT), Genre)
+
+    def test_person(self):
+        assert_encoded_as_schema(storage_persons.BasePerson.parse_obj(PERSON_DOCUMENT), BasePerson)
+
+    def test_list(self):
+        films = [storage_films.Film.parse_obj(document) for document in (FILM_DOCUMENT, EMPTY_FILM_DOCUMENT)]
+
+        assert_encoded_as_schema(films, BaseFilm)
+
+    def test_films_page(self):
+        """
+        A page built with `construct` around the storage models, the fields it is not given are encoded as defaults
+        """
+        page = FilmListWithPagination.construct(
+            count=2,
+            count_is_exact=True,
+            total_pages=1,
+            prev=None,
+            next=None,
+            results=[storage_films.Film.parse_obj(document) for document in (FILM_DOCUMENT, EMPTY_FILM_DOCUMENT)],
+        )
+
+        assert_encoded_as_schema(page, FilmListWithPagination)
+
+    def test_genres_page(self):
+        page = GenreListWithPagination.construct(
+            count=1, total_pages=1, prev=None, next=None, results=[storage_genres.Genre.parse_obj(GENRE_DOCUMENT)]
+        )
+
+        assert_encoded_as_schema(page, GenreListWithPagination)
@@ -0,0 +1,76 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# the endpoints need the services and the auth service client, the tests are skipped where they are not installed
+pytest.importorskip("services.film")
+pytest.importorskip("grpc_auth_service")
+
+from api.v1 import film as film_route  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from db.storage.cache import get_suggest_cache_storage  # noqa: E402
+from db.storage.cache.memory import MemoryAsyncCacheStorage  # noqa: E402
+from db.storage.elasticsearch.film import FilmElasticStorage, get_film_elastic_storage  # noqa: E402
+
+SETTINGS = {
+    "FASTAPI_API_TESTING": "true",
+    "FASTAPI_API_REDIS_DSN": "redis://localhost:6379/0",
+    "FASTAPI_API_DEFAULT_CACHE_TTL": "60",
+    "FASTAPI_API_ELASTICSEARCH_DSN": "http://localhost:9200",
+    "FASTAPI_API_AUTH_SERVICE_DSN": "localhost:50051",
+    "FASTAPI_API_JAEGER__HOST": "localhost",
+    "FASTAPI_API_JAEGER__PORT": "6831",
+    "FASTAPI_API_JAEGER__HEADER": "X-Request-Id",
+    "FASTAPI_API_JAEGER__SERVICE_NAME": "fastapi_api",
+}
+
+
+class FakeElastic:
+    def __init__(self, response: dict[str, any]):
+        self.response = response
+
+    async def search(self, **params) -> dict[str, any]:
+        return self.response
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    for name, value in SETTINGS.items():
+        monkeypatch.setenv(name, value)
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+def make_client(response: dict[str, any]) -> TestClient:
+    storage = FilmElasticStorage(client=None)
+    storage._clients = {"search": FakeElastic(response)}
+    cache = MemoryAsyncCacheStorage(max_items=10, max_bytes=10000)
+
+    app = FastAPI()
+    app.include_router(film_route.router, prefix="/api/v1/films")
+    app.dependency_overrides[get_film_elastic_storage] = lambda: storage
+    app.dependency_overrides[get_suggest_cache_storage] = lambda: cache
+    return TestClient(app)
+
+
+@pytest.mark.usefixtures("settings")
+class TestFilmsSuggest:
+    def test_no_matches(self):
+        """
+        The suggestions don't count the films, so ElasticSearch drops `hits` of a prefix without matches
+        """
+        response = make_client({}).get("/api/v1/films/suggest", params={"prefix": "zzz"})
+
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_matches(self):
+        document = {"id": "b31592e5-673d-46dc-a561-9446438aea0f", "title": "Lunar: The Silver Star"}
+
+        response = make_client({"hits": {"hits": [{"_source": document}]}}).get(
+            "/api/v1/films/suggest", params={"prefix": "lun"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [{"uuid": document["id"], "title": document["title"]}]
@@ -15,6 +15,7 @@ from etl.transformers.filmwork.filmwork_transformer import FilmworkTransformer
 from etl.transformers.genre.genre_transformer import GenreTransformer
 from etl.transformers.person.person_transformer import PersonTransformer
 from helpers.logger import LoggerFactory
+from helpers.utils import get_mapping_fields
 from settings import Settings
 from storage_clients.elasticsearch_client import ElasticsearchClient
 
@@ -30,13 +31,24 @@ def main():
             (settings.elasticsearch_indexes.genres, settings.elasticsearch_indexes.genres_file),
             (settings.elasticsearch_indexes.persons, settings.elasticsearch_indexes.persons_file),
         ):
+            with open(index_file) as f:
+                data = json.load(f)
+
             if not elk_conn.index_exists(index):
                 logger.warn("ELK index `%s` is missing", index)
-                with open(index_file) as f:
-                    data = json.load(f)
-                    elk_conn.index_create(index, body=data)
-
+                elk_conn.index_create(index, body=data)
                 logger.warn("ELK index `%s` created", index)
+                continue
+
+            new_fields = get_mapping_fields(data["mappings"]["properties"]) - get_mapping_fields(
+                elk_conn.index_mapping(index).get("properties", {})
+            )
+
+            if new_fields:
+                # existing documents get the new fields (e.g. multi-fields) only after they are indexed again
+                elk_conn.index_put_mapping(index, body=data["mappings"])
+                elk_conn.index_reindex_in_place(index)
+                logger.warn("ELK index `%s` mapping updated with fields %s", index, sorted(new_fields))
 
     with ThreadPoolExecutor() as pool:
         future_list = [
@@ -1,6 +1,6 @@
 import datetime
 import time
-from contextlib import closing
+from contextlib import closing, nullcontext
 
 from psycopg2.extras import DictCursor
 
@@ -27,10 +27,15 @@ def etl(
 
     with closing(PostgresClient(settings.postgres_dsn, cursor_factory=DictCursor)) as pg_conn, closing(
         ElasticsearchClient(settings.elasticsearch_dsn)
-    ) as elk_conn, closing(RedisClient(settings.redis_dsn)) as redis_conn:
+    ) as elk_conn, closing(RedisClient(settings.redis_dsn)) as redis_conn, (
+        closing(RedisClient(settings.cache_invalidation_redis_dsn))
+        if settings.cache_invalidation_redis_dsn
+        else nullcontext(redis_conn)
+    ) as invalidation_redis_conn:
         pg_conn: PostgresClient
         elk_conn: ElasticsearchClient
         redis_conn: RedisClient
+        invalidation_redis_conn: RedisClient
 
         state = State(RedisStorage(redis_conn), state_key)
 
@@ -42,6 +47,8 @@ def etl(
             state=state,
             elk_index=elk_index,
             load_chunk=settings.load_chunk,
+            redis_conn=invalidation_redis_conn,
+            invalidation_channel=settings.cache_invalidation_channel,
         )
         transformer = transformer_type(
             load_pipe=loader.load,
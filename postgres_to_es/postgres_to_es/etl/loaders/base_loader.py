@@ -1,10 +1,12 @@
 import datetime
+import json
 from abc import abstractmethod, ABC
 from typing import Any, Generator
 
 from helpers.logger import LoggerFactory
 from helpers.state import State
 from storage_clients.elasticsearch_client import ElasticsearchClient
+from storage_clients.redis_client import RedisClient
 
 logger = LoggerFactory().get_logger()
 
@@ -18,11 +20,15 @@ class BaseLoader(ABC):
         state: State,
         elk_index: str,
         load_chunk: int,
+        redis_conn: RedisClient | None = None,
+        invalidation_channel: str | None = None,
     ):
         self.elk_conn = elk_conn
         self.state = state
         self.elk_index = elk_index
         self.load_chunk = load_chunk
+        self.redis_conn = redis_conn
+        self.invalidation_channel = invalidation_channel
 
     def __repr__(self):
         return f"{self.__class__.__name__} for state: {self.state.key}"
@@ -32,6 +38,27 @@ class BaseLoader(ABC):
         """Method to prepare and load data, based on ELK index."""
         raise NotImplementedError
 
+    def _get_references(self, data: list[dict[str, Any]]) -> dict[str, list[str]]:
+        """Returns the ids of the entities the loaded documents refer to, by the name of the reference."""
+        return {}
+
+    def _publish_changes(self, data: list[dict[str, Any]]) -> None:
+        """
+        Publishes the ids of the loaded documents and of the entities they refer to, so the search API evicts them
+        and the values built from the documents by the entities, e.g. the filmographies of the persons, from its cache.
+        """
+        if not self.redis_conn or not self.invalidation_channel or not data:
+            return
+
+        message = json.dumps(
+            {
+                "index": self.elk_index,
+                "ids": [str(action["_id"]) for action in data],
+                "references": self._get_references(data),
+            }
+        )
+        self.redis_conn.publish(self.invalidation_channel, message)
+
     @abstractmethod
     def load(self) -> Generator[None, tuple[datetime.datetime, list[Any]], None]:
         """Method to load data to ELK. Send data to loader. Receive data from transformer."""
@@ -47,6 +74,7 @@ class BaseLoader(ABC):
                     chunk_size=self.load_chunk,
                     index=self.elk_index,
                 )
+                self._publish_changes(data)
 
                 if not saved_state:
                     saved_state = last_updated
@@ -38,5 +38,15 @@ class FilmworkLoader(BaseLoader):
             for row in rows
         ]
 
+    def _get_references(self, data: list[dict[str, Any]]) -> dict[str, list[str]]:
+        # a person removed from a film is not among its persons anymore, the pages with the film are evicted by its id
+        persons = {
+            str(person["id"])
+            for action in data
+            for role in ("directors", "actors", "writers")
+            for person in action["doc"][role]
+        }
+        return {"persons": sorted(persons)}
+
     def load(self) -> Generator[None, tuple[datetime.datetime, list[Filmwork]], None]:
         return super().load()
@@ -5,3 +5,16 @@ class SingletonType(type):
         if cls not in cls._instances:
             cls._instances[cls] = super().__call__(*args, **kwargs)
         return cls._instances[cls]
+
+
+def get_mapping_fields(properties: dict, prefix: str = "") -> set[str]:
+    """Returns the paths of all the fields of the index mapping, including object properties and multi-fields."""
+    fields = set()
+
+    for name, field in properties.items():
+        path = f"{prefix}{name}"
+        fields.add(path)
+        fields |= get_mapping_fields(field.get("properties", {}), f"{path}.")
+        fields |= get_mapping_fields(field.get("fields", {}), f"{path}.")
+
+    return fields
@@ -17,6 +17,10 @@ class Settings(BaseSettings):
     elasticsearch_dsn: AnyHttpUrl
     elasticsearch_indexes: ElkIndexes
     load_chunk: int
+    # channel of the search API cache, ids of the loaded documents are published to it
+    cache_invalidation_channel: str | None = "fastapi_api:invalidation"
+    # Redis the search API listens to the channel in (its `cache_invalidation.redis_dsn`), `redis_dsn` if not set
+    cache_invalidation_redis_dsn: RedisDsn | None = None
 
     class Config:
         env_prefix = "etl_movies_"
@@ -54,3 +54,19 @@ class ElasticsearchClient(AbstractStorage):
     @storage_reconnect
     def bulk(self, actions: list, *args, **kwargs) -> None:
         helpers.bulk(self._connection, *args, actions=actions, **kwargs)
+
+    @backoff(exceptions=(base_exceptions, elastic_transport.SerializationError))
+    @storage_reconnect
+    def index_mapping(self, index: str) -> dict:
+        return self._connection.indices.get_mapping(index=index)[index]["mappings"]
+
+    @backoff(exceptions=(base_exceptions, elastic_transport.SerializationError))
+    @storage_reconnect
+    def index_put_mapping(self, index: str, body: dict) -> None:
+        return self._connection.indices.put_mapping(index=index, **body)
+
+    @backoff(exceptions=(base_exceptions, elastic_transport.SerializationError))
+    @storage_reconnect
+    def index_reindex_in_place(self, index: str) -> None:
+        """Starts reindexing all the documents of the index in the background, so new fields get populated."""
+        return self._connection.update_by_query(index=index, conflicts="proceed", wait_for_completion=False)
@@ -75,3 +75,8 @@ class RedisClient(AbstractStorage):
     @storage_reconnect
     def set(self, name: KeyT, value: EncodableT, *args, **kwargs) -> None:
         return self._connection.set(name, value, *args, **kwargs)
+
+    @backoff(exceptions=base_exceptions)
+    @storage_reconnect
+    def publish(self, channel: str, message: EncodableT) -> int:
+        return self._connection.publish(channel, message)